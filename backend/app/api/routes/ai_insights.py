@@ -1,8 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
-import pandas as pd
-from app.services.data_service import data_service
 from app.services.analysis_service import analysis_service
 from app.services.openai_service import openai_service
 
@@ -33,20 +31,15 @@ async def get_ai_status():
 async def get_ai_insights(request: InsightsRequest):
     """Get AI-powered insights about the data"""
     try:
-        # Load data
-        file_path = f"{data_service.data_path}/{request.filename}"
-        try:
-            df = pd.read_csv(file_path.replace(".csv", "_preprocessed.csv"))
-        except:
-            df = pd.read_csv(file_path)
-        
-        # Get standard analysis
-        analysis_result = await analysis_service.analyze_data_context(df, request.target_column)
+        # Get standard analysis (memoized per dataset version)
+        analysis_result = await analysis_service.analyze_dataset(
+            request.filename, request.target_column, prefer_preprocessed=True
+        )
         
         # Prepare data summary
         data_summary = {
-            "total_rows": len(df),
-            "total_columns": len(df.columns),
+            "total_rows": analysis_result.get("data_characteristics", {}).get("total_rows", 0),
+            "total_columns": analysis_result.get("data_characteristics", {}).get("total_columns", 0),
             "numerical_columns": analysis_result.get("data_characteristics", {}).get("numerical_columns", 0),
             "categorical_columns": analysis_result.get("data_characteristics", {}).get("categorical_columns", 0),
             "missing_values": analysis_result.get("data_characteristics", {}).get("missing_values", 0),
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
-import pandas as pd
+from pydantic import BaseModel, Field
+from typing import Optional, List
 from app.services.analysis_service import analysis_service
+from app.services.ab_testing_service import ab_testing_service
 from app.services.data_service import data_service
 from app.services.openai_service import openai_service
 
@@ -12,20 +12,28 @@ class AnalysisRequest(BaseModel):
     filename: str
     target_column: Optional[str] = None
 
+class ABTestRequest(BaseModel):
+    filename: str
+    group_column: str = "group"
+    metrics: Optional[List[str]] = None  # Defaults to every numeric column
+    control: Optional[str] = None
+    alpha: float = Field(0.05, gt=0, lt=1)
+    correction: str = "holm"  # "holm", "bh" or "none"
+    n_bootstrap: int = Field(1000, ge=0)  # 0 skips the confidence intervals
+    confidence: float = Field(0.95, gt=0, lt=1)
+
 @router.post("/analyze")
 async def analyze_data(request: AnalysisRequest):
     """Smart data analysis with optional AI insights"""
-    file_path = f"{data_service.data_path}/{request.filename}"
     try:
-        df = pd.read_csv(file_path)
-        result = await analysis_service.analyze_data_context(df, request.target_column)
+        result = await analysis_service.analyze_dataset(request.filename, request.target_column)
         
         # Add AI insights if OpenAI is available
         ai_insights = None
         if openai_service.is_available():
             data_summary = {
-                "total_rows": len(df),
-                "total_columns": len(df.columns),
+                "total_rows": result.get("data_characteristics", {}).get("total_rows", 0),
+                "total_columns": result.get("data_characteristics", {}).get("total_columns", 0),
                 "numerical_columns": result.get("data_characteristics", {}).get("numerical_columns", 0),
                 "categorical_columns": result.get("data_characteristics", {}).get("categorical_columns", 0),
                 "missing_values": result.get("data_characteristics", {}).get("missing_values", 0),
@@ -38,3 +46,22 @@ async def analyze_data(request: AnalysisRequest):
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/profile/{filename}")
+async def get_profile(filename: str, prefer_preprocessed: bool = False):
+    """Per-column histograms, quantiles, null rates and top values (built once, then read from storage)"""
+    try:
+        return await analysis_service.profile_dataset(filename, prefer_preprocessed)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/ab-test")
+async def ab_test(request: ABTestRequest):
+    """Test every group against the control on every metric"""
+    try:
+        df = await data_service.load_dataset(request.filename)
+        return await ab_testing_service.run(df, **request.model_dump(exclude={"filename"}))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,19 +1,30 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import pandas as pd
+import asyncio
+import json
 from app.services.data_service import data_service
-from app.ml.trainer import model_trainer
+from app.services.training_job_service import training_job_service
+from app.services.job_store import FINAL_STATUSES
 from app.config import settings
 
 router = APIRouter()
 
+# Seconds between polls of the job table while streaming a job's events
+EVENT_POLL_INTERVAL = 1.0
+
 class TrainRequest(BaseModel):
     filename: str
     target: str
     problem_type: str
     model_name: Optional[str] = None
     features: Optional[List[str]] = None
+    max_training_time: Optional[int] = None  # Seconds; defaults to MAX_TRAINING_TIME, 0 = unlimited
+    successive_halving: Optional[bool] = None  # Screen candidates on subsamples; defaults to on from HALVING_MIN_ROWS rows
+    force: bool = False  # Train even if an identical request already has a model
+    incremental: bool = False  # Retrain the latest model of this dataset and target instead of searching again
+    base_model_id: Optional[str] = None  # Model to retrain incrementally (implies incremental)
 
 @router.get("/train/status")
 async def training_status():
@@ -30,7 +41,10 @@ async def training_status():
             "model_path": settings.MODEL_STORAGE_PATH,
             "data_dir_exists": data_dir_exists,
             "model_dir_exists": model_dir_exists,
-            "n_jobs": settings.N_JOBS
+            "n_jobs": settings.N_JOBS,
+            "training_workers": settings.TRAINING_WORKERS,
+            "training_isolation": settings.TRAINING_ISOLATION,
+            "training_dispatch": settings.TRAINING_DISPATCH
         }
     except Exception as e:
         return {
@@ -38,45 +52,103 @@ async def training_status():
             "error": str(e)
         }
 
-@router.post("/train")
+@router.post("/train", status_code=202)
 async def train_model(request: TrainRequest):
-    """Train a model with automated tuning"""
+    """Queue a training with automated tuning; poll /train/jobs/{job_id} for its progress"""
+    loop = asyncio.get_event_loop()
     try:
-        # Load the preprocessed data
-        file_path = f"{data_service.data_path}/{request.filename}"
-        # Try preprocessed version first, then original
-        preprocessed_path = file_path.replace(".csv", "_preprocessed.csv")
-        try:
-            df = pd.read_csv(preprocessed_path)
-        except FileNotFoundError:
-            df = pd.read_csv(file_path)
-        
-        # Validate target column exists
-        if request.target not in df.columns:
+        # Validate against the stored schema without loading the rows
+        name = await loop.run_in_executor(None, data_service.resolve_dataset, request.filename, True)
+        manifest = await loop.run_in_executor(None, data_service.store.manifest, name)
+        if request.target not in manifest["column_names"]:
             raise HTTPException(
                 status_code=400, 
                 detail=f"Target column '{request.target}' not found in dataset"
             )
         
-        # Train the model
-        result = await model_trainer.train(
-            df=df,
-            target=request.target,
-            problem_type=request.problem_type,
-            model_name=request.model_name,
-            features=request.features
+        # An identical earlier request returns its existing job (and model) instead of retraining
+        # Off the event loop: hashing the request and writing the job table block
+        return await loop.run_in_executor(
+            None, training_job_service.submit, request.model_dump(exclude={"force"}), request.force
         )
-        
-        if result.get("status") == "failed":
-            error_msg = result.get("error", "Training failed")
-            error_details = result.get("details", {})
-            full_error = f"{error_msg}"
-            if error_details.get("error_type"):
-                full_error += f" ({error_details['error_type']})"
-            raise HTTPException(status_code=500, detail=full_error)
-        
-        return result
     except HTTPException:
         raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/train/jobs")
+async def list_training_jobs(status: Optional[str] = None, limit: int = 100):
+    """Most recent training jobs, optionally filtered by status"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, training_job_service.list, status, limit)
+
+async def _get_job(job_id: str):
+    # The job table is SQLite on disk: every read goes through the executor
+    loop = asyncio.get_event_loop()
+    job = await loop.run_in_executor(None, training_job_service.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job '{job_id}' not found")
+    return job
+
+@router.get("/train/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """Status, stage and progress of a training job"""
+    return await _get_job(job_id)
+
+@router.get("/train/jobs/{job_id}/result")
+async def get_training_result(job_id: str):
+    """Result of a completed training job (model id and leaderboard metrics)"""
+    job = await _get_job(job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"] or "Training failed")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Training job is {job['status']}")
+    return job["result"]
+
+@router.get("/train/jobs/{job_id}/events")
+async def stream_training_events(job_id: str, request: Request):
+    """Server-sent events of a training job: stages with ETA, each estimator's fold scores and time, tuning
+    
+    The stream ends with an "end" event carrying the final job record.
+    Reconnecting clients resume after the Last-Event-ID they received.
+    """
+    await _get_job(job_id)
+    last_seq = int(request.headers.get("last-event-id") or 0)
+    loop = asyncio.get_event_loop()
+    
+    async def event_stream():
+        nonlocal last_seq
+        while True:
+            # Read the job before its events so that nothing logged before it finished is missed
+            job = await loop.run_in_executor(None, training_job_service.get, job_id)
+            events = await loop.run_in_executor(None, training_job_service.events, job_id, last_seq)
+            for event in events:
+                last_seq = event["seq"]
+                yield f"id: {last_seq}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+            if job["status"] in FINAL_STATUSES:
+                yield f"event: end\ndata: {json.dumps(job, default=str)}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/train/timings")
+async def training_timings(estimator: Optional[str] = None, limit: int = 1000):
+    """Recorded cross-validation times per estimator and data shape, for capacity planning"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, training_job_service.timings, estimator, limit)
+
+@router.post("/train/jobs/{job_id}/cancel")
+async def cancel_training_job(job_id: str):
+    """Cancel a queued job; a running job stops at its next stage boundary"""
+    await _get_job(job_id)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, training_job_service.cancel, job_id)
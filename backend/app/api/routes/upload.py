@@ -1,22 +1,189 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.data_service import data_service
-from app.models.schemas import UploadResponse, PreprocessResponse
+from fastapi import APIRouter, HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+from typing import AsyncIterator, Deque, Optional, Tuple
+import collections
+from app.config import settings
+from app.services.data_service import data_service, FileTooLargeError, UPLOAD_COMPRESSION
+from app.models.schemas import UploadResponse, AppendResponse, PreprocessResponse
 
 router = APIRouter()
 
+# Allowance for multipart boundaries and part headers on top of MAX_FILE_SIZE
+MULTIPART_OVERHEAD_BYTES = 65536
+# Longest non-file form field (e.g. a dataset name)
+MAX_FORM_FIELD_BYTES = 1024
+
+async def _iter_form(request: Request) -> AsyncIterator[Tuple[str, Optional[str], AsyncIterator[bytes]]]:
+    """Parse a multipart body as it arrives, yielding (field name, filename, content chunks) per part
+    
+    Starlette's form parsing spools every file to disk before the handler runs;
+    this reads request.stream() instead, so a rejected upload stops the transfer.
+    A part's chunks must be read before asking for the next part; what is left
+    unread is skipped.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    events: Deque[Tuple[str, object]] = collections.deque()
+    header = {"field": bytearray(), "value": bytearray()}
+    headers = {}
+    
+    def on_header_end():
+        headers[bytes(header["field"]).lower()] = bytes(header["value"])
+        header["field"].clear()
+        header["value"].clear()
+    
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": headers.clear,
+        "on_header_field": lambda data, start, end: header["field"].extend(data[start:end]),
+        "on_header_value": lambda data, start, end: header["value"].extend(data[start:end]),
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("begin", dict(headers))),
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+    stream = request.stream()
+    
+    async def next_event() -> Optional[Tuple[str, object]]:
+        """The next parser event, reading more of the body as needed; None at its end"""
+        while not events:
+            try:
+                chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                parser.finalize()
+                return events.popleft() if events else None
+            parser.write(chunk)
+        return events.popleft()
+    
+    while True:
+        event = await next_event()
+        if event is None:
+            return
+        kind, part_headers = event
+        if kind != "begin":
+            continue  # Rest of a part the caller did not read
+        _, options = parse_options_header(part_headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        part = {"done": False}
+        
+        async def chunks():
+            # Parser events follow the network reads, often a few KB; the content goes on in UPLOAD_CHUNK_SIZE pieces
+            buffer = bytearray()
+            while not part["done"]:
+                event = await next_event()
+                if event is None or event[0] == "end":
+                    part["done"] = True
+                    break
+                buffer += event[1]
+                if len(buffer) >= settings.UPLOAD_CHUNK_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+        
+        yield options.get(b"name", b"").decode(), filename.decode() if filename is not None else None, chunks()
+
+async def _read_field(chunks: AsyncIterator[bytes]) -> str:
+    value = bytearray()
+    async for chunk in chunks:
+        value.extend(chunk)
+        if len(value) > MAX_FORM_FIELD_BYTES:
+            raise HTTPException(status_code=400, detail=f"Form field longer than {MAX_FORM_FIELD_BYTES} bytes")
+    return value.decode()
+
+def _check_content_length(request: Request):
+    """Reject a declared body that cannot fit MAX_FILE_SIZE before reading any of it"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File exceeds the maximum upload size of {settings.MAX_FILE_SIZE} bytes"
+        )
+
+def _check_filename(filename: str):
+    if not filename.endswith(tuple(UPLOAD_COMPRESSION)):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only CSV files are supported ({', '.join(UPLOAD_COMPRESSION)})"
+        )
+
+async def _single_file(request: Request, field: str = "file") -> Tuple[str, AsyncIterator[bytes]]:
+    """Filename and content of the form's one file field"""
+    async for name, filename, chunks in _iter_form(request):
+        if name == field and filename:
+            _check_filename(filename)
+            return filename, chunks
+    raise HTTPException(status_code=400, detail=f"Missing file field '{field}'")
+
 @router.post("/upload", response_model=UploadResponse)
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and ingest data"""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Only CSV files are supported")
+async def upload_file(request: Request):
+    """Upload and ingest data (multipart field "file"), parsed as it streams in"""
+    _check_content_length(request)
+    filename, chunks = await _single_file(request)
     
-    content = await file.read()
-    result = await data_service.ingest_data(content, file.filename)
+    try:
+        result = await data_service.ingest_stream(chunks, filename)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return UploadResponse(**result)
 
+@router.post("/upload/dataset", response_model=UploadResponse)
+async def upload_dataset(request: Request):
+    """Upload several CSV shards (multipart fields "name", then "files") and register them as one dataset"""
+    _check_content_length(request)
+    form = _iter_form(request)
+    name = None
+    async for field, filename, chunks in form:
+        if field == "name" and filename is None:
+            name = await _read_field(chunks)
+            break
+        if filename is not None:
+            raise HTTPException(status_code=400, detail="The 'name' field must come before the files")
+    if not name:
+        raise HTTPException(status_code=400, detail="Missing form field 'name'")
+    
+    async def shards():
+        async for field, filename, chunks in form:
+            if field == "files" and filename:
+                _check_filename(filename)
+                yield filename, chunks
+    
+    try:
+        result = await data_service.ingest_parts(name, shards())
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return UploadResponse(**result)
+
+@router.post("/upload/{name}/append", response_model=AppendResponse)
+async def append_data(name: str, request: Request):
+    """Append the rows of a CSV (multipart field "file") to an existing dataset (and its preprocessed version)"""
+    _check_content_length(request)
+    filename, chunks = await _single_file(request)
+    
+    try:
+        result = await data_service.append_stream(name, chunks, filename)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return AppendResponse(**result)
+
+@router.get("/datasets/cache")
+async def dataset_cache_stats():
+    """Hit/miss statistics of the shared dataset cache"""
+    return data_service.cache.stats()
+
 @router.post("/preprocess/{filename}", response_model=PreprocessResponse)
-async def preprocess_data(filename: str):
-    """Preprocess uploaded data"""
-    file_path = f"{data_service.data_path}/{filename}"
-    result = await data_service.preprocess_data(file_path)
+async def preprocess_data(filename: str, chunked: Optional[bool] = None):
+    """Preprocess uploaded data (chunked=None picks out-of-core mode from the dataset size)"""
+    try:
+        result = await data_service.preprocess_data(filename, chunked)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     return PreprocessResponse(**result)
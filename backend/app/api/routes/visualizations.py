@@ -6,6 +6,7 @@ import numpy as np
 from app.services.model_service import model_service
 from app.services.data_service import data_service
 from app.services.visualization_service import visualization_service
+from app.services.analysis_service import analysis_service
 import asyncio
 import logging
 
@@ -16,7 +17,21 @@ router = APIRouter()
 class PredictAndVisualizeRequest(BaseModel):
     filename: str
     target_column: str
-    chart_types: Optional[List[str]] = None
+    chart_types: Optional[List[str]] = None  # "feature_distributions" is opt-in
+
+@router.get("/visualizations/distributions/{filename}")
+async def column_distributions(filename: str, columns: Optional[str] = None, prefer_preprocessed: bool = False):
+    """Distribution chart per column (comma-separated columns, default the first 12), drawn from the stored profile"""
+    try:
+        profile = await analysis_service.profile_dataset(filename, prefer_preprocessed)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    charts = visualization_service.generate_column_distributions(
+        profile, columns.split(",") if columns else None
+    )
+    if "error" in charts:
+        raise HTTPException(status_code=400, detail=charts["error"])
+    return {"filename": filename, "rows": profile["rows"], "visualizations": charts}
 
 @router.post("/visualizations/{model_id}/predict-and-visualize")
 async def predict_and_visualize(
@@ -39,13 +54,7 @@ async def predict_and_visualize(
         logger.info(f"Model loaded: {problem_type}")
         
         # Load and prepare data
-        file_path = f"{data_service.data_path}/{filename}"
-        try:
-            df = pd.read_csv(file_path.replace(".csv", "_preprocessed.csv"))
-            logger.info("Using preprocessed data")
-        except Exception as e:
-            logger.info(f"Preprocessed file not found, using original: {e}")
-            df = pd.read_csv(file_path)
+        df = await data_service.load_dataset(filename, prefer_preprocessed=True)
         
         logger.info(f"Data loaded: {df.shape[0]} rows, {df.shape[1]} columns")
         logger.info(f"Columns: {list(df.columns)}")
@@ -116,6 +125,16 @@ async def predict_and_visualize(
             except Exception as e:
                 visualizations["correlation_heatmap"] = {"error": str(e)}
         
+        # Feature distributions, read from the dataset's stored profile
+        if "feature_distributions" in chart_types:
+            try:
+                profile = await analysis_service.profile_dataset(filename, prefer_preprocessed=True)
+                visualizations["feature_distributions"] = visualization_service.generate_column_distributions(
+                    profile, [col for col in X.columns if col in {c["name"] for c in profile["columns"]}]
+                )
+            except Exception as e:
+                visualizations["feature_distributions"] = {"error": str(e)}
+        
         # Classification-specific charts
         if problem_type != "Regression":
             if "confusion_matrix" in chart_types:
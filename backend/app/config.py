@@ -15,8 +15,21 @@ class Settings(BaseSettings):
     
     # ML Settings
     MAX_FILE_SIZE: int = 10485760  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1048576  # 1MB read/write chunks for streamed uploads
     MODEL_STORAGE_PATH: str = "./models"
     DATA_STORAGE_PATH: str = "./data"
+    CSV_ENGINE: str = "pyarrow"  # "pyarrow" (multi-threaded, block-parallel) or "c" (pandas, single-threaded)
+    CSV_THREADS: int = 0  # Parser threads for the pyarrow engine (0 = all CPUs)
+    CSV_BLOCK_SIZE: int = 16777216  # 16MB blocks, parsed in parallel by the pyarrow engine
+    COMPACT_DTYPES: bool = True  # Downcast numerics and categorize low-cardinality strings at ingest
+    CATEGORY_MAX_UNIQUE_RATIO: float = 0.5  # Max distinct/rows ratio for a string column to become categorical
+    CHUNKED_PROCESSING_MIN_BYTES: int = 2147483648  # 2GB; larger data is ingested/preprocessed in chunks
+    CHUNK_ROWS: int = 1000000  # Rows per chunk for out-of-core ingestion and preprocessing
+    DATASET_CACHE_MAX_BYTES: int = 1073741824  # 1GB of loaded DataFrames shared by all routes (0 disables)
+    
+    # Analysis Settings
+    APPROX_PROFILE_MIN_ROWS: int = 5000000  # Datasets with at least this many rows are profiled approximately
+    APPROX_SAMPLE_ROWS: int = 200000  # Rows sampled for approximate problem-type and missing-value inference
     
     # API Keys (modular - can be added later)
     OPENAI_API_KEY: str = ""
@@ -24,8 +37,25 @@ class Settings(BaseSettings):
     HUGGINGFACE_TOKEN: str = ""
     
     # Training Settings
-    MAX_TRAINING_TIME: int = 3600  # 1 hour
+    MAX_TRAINING_TIME: int = 3600  # 1 hour; wall-clock budget of one training (0 = unlimited)
+    COMPARE_MAX_CANDIDATES: int = 8  # Estimators from ModelSelector's shortlist cross-validated by compare_models
+    COMPARE_TIME_FRACTION: float = 0.6  # Share of the remaining budget given to model comparison; tuning gets the rest
+    SETUP_CACHE_MAX_BYTES: int = 2147483648  # 2GB of prepared experiments reused across trainings (0 disables)
+    INCREMENTAL_BOOST_ROUNDS: int = 100  # Boosting rounds added to a saved LightGBM/XGBoost/CatBoost model by incremental retraining
+    HALVING_MIN_ROWS: int = 200000  # Datasets with at least this many rows screen candidates by successive halving
+    HALVING_MIN_SAMPLE: int = 10000  # Rows in the first screening round
+    HALVING_ETA: int = 3  # Each round keeps the top 1/ETA of the candidates and grows the sample ETA times
+    HALVING_FINALISTS: int = 2  # Candidates that go on to full cross-validation on all rows
+    HALVING_FOLDS: int = 3  # CV folds in screening rounds
+    TUNE_TOP_K: int = 3  # Leaderboard models tuned together in one hyperparameter search
+    TUNE_MAX_TRIALS: int = 50  # Trials of the search when the time budget allows them all
+    TUNE_PATIENCE: int = 15  # Stop the search after this many trials without a better score
     N_JOBS: int = -1  # Use all CPUs
+    TRAINING_WORKERS: int = 2  # Trainings run concurrently by the job pool; the rest wait queued
+    TRAINING_ISOLATION: str = "process"  # "process" (one spawned worker process per training) or "thread"
+    TRAINING_DISPATCH: str = "local"  # "local" (the API's own pool) or "queue" (the API only enqueues; `python -m app.worker` runs jobs)
+    WORKER_POLL_INTERVAL: float = 2.0  # Seconds between a worker's looks at the queue, and between heartbeats of running jobs
+    WORKER_HEARTBEAT_TIMEOUT: int = 120  # Running jobs whose worker or API pool has not checked in for this long are failed
     
     model_config = SettingsConfigDict(
         # Try multiple locations for .env file
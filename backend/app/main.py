@@ -7,6 +7,7 @@ from pathlib import Path
 import uvicorn
 from app.config import settings
 from app.api.routes import upload, analysis, training, models, visualizations, ai_insights, config_check, debug
+from app.services.training_job_service import training_job_service
 
 app = FastAPI(
     title="RASAN AI Labs API",
@@ -23,6 +24,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_training_jobs():
+    # Jobs queued before a restart are picked up again
+    training_job_service.recover()
+
+@app.on_event("shutdown")
+async def stop_training_jobs():
+    training_job_service.shutdown()
+
 # Include routers
 app.include_router(upload.router, prefix="/api/v1", tags=["upload"])
 app.include_router(analysis.router, prefix="/api/v1", tags=["analysis"])
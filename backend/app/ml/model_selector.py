@@ -1,7 +1,127 @@
 import pandas as pd
 from typing import Dict, Any, Optional, List
+import statistics
+
+# Recommended PyCaret estimators per problem family, in priority order
+RECOMMENDED_MODELS = {
+    "regression": [
+        ("lr", "Linear Regression"), ("rf", "Random Forest"), ("xgboost", "XGBoost"),
+        ("lightgbm", "LightGBM"), ("catboost", "CatBoost"), ("ridge", "Ridge"),
+        ("et", "Extra Trees"), ("gbr", "Gradient Boosting"), ("lasso", "Lasso"),
+        ("en", "Elastic Net"), ("dt", "Decision Tree"), ("knn", "K Neighbors"),
+        ("svm", "Support Vector Machine"),
+    ],
+    "classification": [
+        ("lr", "Logistic Regression"), ("rf", "Random Forest"), ("xgboost", "XGBoost"),
+        ("lightgbm", "LightGBM"), ("catboost", "CatBoost"), ("et", "Extra Trees"),
+        ("gbc", "Gradient Boosting"), ("ridge", "Ridge"), ("nb", "Naive Bayes"),
+        ("lda", "Linear Discriminant Analysis"), ("dt", "Decision Tree"), ("knn", "K Neighbors"),
+        ("svm", "Support Vector Machine"),
+    ],
+}
+# Relative fit cost on 1,000 rows and one feature, growing with rows ** row_exponent
+# and linearly with features. Estimators whose cost explodes with size are dropped
+# above max_rows.
+MODEL_COSTS = {
+    "lr": {"cost": 1, "row_exponent": 1.0},
+    "ridge": {"cost": 1, "row_exponent": 1.0},
+    "lasso": {"cost": 1, "row_exponent": 1.0},
+    "en": {"cost": 1, "row_exponent": 1.0},
+    "nb": {"cost": 1, "row_exponent": 1.0},
+    "lda": {"cost": 1, "row_exponent": 1.0},
+    "dt": {"cost": 2, "row_exponent": 1.1},
+    "lightgbm": {"cost": 10, "row_exponent": 1.0},
+    "xgboost": {"cost": 20, "row_exponent": 1.0},
+    "et": {"cost": 30, "row_exponent": 1.1},
+    "gbr": {"cost": 40, "row_exponent": 1.1},
+    "gbc": {"cost": 40, "row_exponent": 1.1},
+    "rf": {"cost": 50, "row_exponent": 1.1},
+    "catboost": {"cost": 80, "row_exponent": 1.0},
+    "knn": {"cost": 2, "row_exponent": 1.5, "max_rows": 100000},
+    "svm": {"cost": 5, "row_exponent": 2.0, "max_rows": 100000},
+}
+
+
+def problem_family(problem_type: str) -> str:
+    """'classification' or 'regression' for any of the problem type spellings the API accepts"""
+    classification = ["binary classification", "multi-class classification", "classification"]
+    return "classification" if problem_type.lower() in classification else "regression"
+
 
 class ModelSelector:
+    def estimate_cost(self, model_id: str, n_rows: int, n_features: int) -> float:
+        """Relative fit cost of an estimator on data of this shape (lr on 1,000 x 1 = 1)"""
+        cost = MODEL_COSTS[model_id]
+        return cost["cost"] * (max(n_rows, 1) / 1000) ** cost["row_exponent"] * max(n_features, 1)
+    
+    def estimate_seconds(
+        self,
+        model_id: str,
+        n_rows: int,
+        n_features: int,
+        folds: int,
+        observations: List[Dict[str, Any]]
+    ) -> Optional[float]:
+        """Cross-validation time of an estimator on data of this shape, scaled from measured runs
+        
+        Observations are dicts of estimator, rows, features, folds and seconds
+        (screening rounds, earlier candidates, estimator_timings). Runs of the
+        same estimator are preferred; otherwise other estimators' runs are scaled
+        by the ratio of the two costs. None when nothing has been measured.
+        """
+        usable = [
+            observation for observation in observations
+            if observation["estimator"] in MODEL_COSTS and observation.get("rows") and observation.get("folds")
+        ]
+        same = [observation for observation in usable if observation["estimator"] == model_id]
+        if not (same or usable):
+            return None
+        target = self.estimate_cost(model_id, n_rows, n_features) * folds
+        return statistics.median(
+            observation["seconds"] * target / (
+                self.estimate_cost(observation["estimator"], observation["rows"], observation.get("features") or n_features)
+                * observation["folds"]
+            )
+            for observation in same or usable
+        )
+    
+    def rank(self, problem_type: str, n_rows: int, n_features: int) -> List[Dict[str, Any]]:
+        """Recommended estimators for the problem, by priority, with their cost on this shape"""
+        ranked = []
+        for priority, (model_id, name) in enumerate(RECOMMENDED_MODELS[problem_family(problem_type)], start=1):
+            max_rows = MODEL_COSTS[model_id].get("max_rows")
+            excluded = max_rows is not None and n_rows > max_rows
+            ranked.append({
+                "id": model_id,
+                "name": name,
+                "priority": priority,
+                "estimated_cost": round(self.estimate_cost(model_id, n_rows, n_features), 2),
+                "excluded": excluded,
+                "reason": f"Too slow above {max_rows:,} rows" if excluded else None
+            })
+        return ranked
+    
+    def shortlist(
+        self,
+        problem_type: str,
+        n_rows: int,
+        n_features: int,
+        max_candidates: int,
+        available: Optional[List[str]] = None
+    ) -> List[str]:
+        """PyCaret ids to pass to compare_models(include=...), cheapest first
+        
+        The top max_candidates by priority that are not excluded for this data
+        size (and are installed, if `available` is given). They are returned in
+        order of estimated cost so a time-budgeted comparison covers the cheap
+        candidates before it runs out.
+        """
+        ranked = [
+            model for model in self.rank(problem_type, n_rows, n_features)
+            if not model["excluded"] and (available is None or model["id"] in available)
+        ][:max_candidates]
+        return [model["id"] for model in sorted(ranked, key=lambda model: model["estimated_cost"])]
+    
     async def select_models(
         self,
         df: pd.DataFrame,
@@ -10,36 +130,17 @@ class ModelSelector:
         features: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """Smart model selection based on problem type and data characteristics"""
+        n_samples = len(df)
+        n_features = len(features) if features else len(df.columns) - 1
+        ranked = self.rank(problem_type, n_samples, n_features)
         selection = {
             "problem_type": problem_type,
-            "recommended_models": [],
+            "recommended_models": [model for model in ranked if not model["excluded"]],
+            "excluded_models": [model for model in ranked if model["excluded"]],
             "selection_criteria": {}
         }
         
-        if problem_type == "Regression":
-            selection["recommended_models"] = [
-                {"name": "Linear Regression", "priority": 1},
-                {"name": "Random Forest", "priority": 2},
-                {"name": "XGBoost", "priority": 3},
-                {"name": "LightGBM", "priority": 4},
-                {"name": "CatBoost", "priority": 5}
-            ]
-        elif problem_type == "Binary Classification":
-            selection["recommended_models"] = [
-                {"name": "Logistic Regression", "priority": 1},
-                {"name": "Random Forest", "priority": 2},
-                {"name": "XGBoost", "priority": 3},
-                {"name": "LightGBM", "priority": 4}
-            ]
-        elif problem_type == "Multi-class Classification":
-            selection["recommended_models"] = [
-                {"name": "Random Forest", "priority": 1},
-                {"name": "XGBoost", "priority": 2},
-                {"name": "LightGBM", "priority": 3}
-            ]
-        
         # Add selection criteria based on data size
-        n_samples = len(df)
         if n_samples < 1000:
             selection["selection_criteria"]["note"] = "Small dataset - simpler models recommended"
         elif n_samples > 100000:
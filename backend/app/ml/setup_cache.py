@@ -0,0 +1,135 @@
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+import pycaret
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SETUP_CACHE_DIR = "setup_cache"
+EXPERIMENT_FILE = "experiment.pkl"
+DATA_FILE = "data.pkl"
+
+
+class SetupCache:
+    """Prepared PyCaret experiments on disk, reused by later trainings on the same data
+    
+    An entry holds what setup() produced: the experiment (fitted preprocessing
+    pipeline, train/test split, fold generator and seed, saved with
+    save_experiment) and the split data it refers to. It is keyed by the
+    dataset's content version, the target, the columns, the experiment type,
+    the setup parameters and the PyCaret version, so any change to those
+    misses. Loading skips setup entirely (load_experiment with
+    preprocess_data=False), and the restored fold generator yields the same
+    CV folds as before.
+    
+        models/setup_cache/<key>/experiment.pkl
+        models/setup_cache/<key>/data.pkl
+    
+    Entries are written to a staging directory and swapped in, and the least
+    recently used are deleted once the cache exceeds max_bytes (0 disables it).
+    """
+    
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root) if root else Path(settings.MODEL_STORAGE_PATH) / SETUP_CACHE_DIR
+        self.max_bytes = settings.SETUP_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+    
+    def key(
+        self,
+        dataset_version: str,
+        target: str,
+        columns: List[str],
+        experiment_type: str,
+        setup_params: Dict[str, Any]
+    ) -> str:
+        identity = {
+            "dataset_version": dataset_version,
+            "target": target,
+            "columns": columns,
+            "experiment": experiment_type,
+            "setup": setup_params,
+            "pycaret": pycaret.__version__
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def load(self, key: str, experiment_cls):
+        """The cached experiment for key, or None on a miss or an unreadable entry"""
+        entry_dir = self.root / key
+        if not self.enabled or not entry_dir.exists():
+            return None
+        try:
+            experiment = experiment_cls.load_experiment(
+                str(entry_dir / EXPERIMENT_FILE),
+                data=pd.read_pickle(entry_dir / DATA_FILE),
+                preprocess_data=False
+            )
+        except Exception as e:
+            logger.warning(f"Dropping unreadable setup cache entry {key}: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        try:
+            # Recency for eviction
+            os.utime(entry_dir)
+        except OSError as e:
+            # Evicted or replaced by another training meanwhile; the loaded experiment is still good
+            logger.warning(f"Could not touch setup cache entry {key}: {e}")
+        return experiment
+    
+    def save(self, key: str, experiment):
+        if not self.enabled:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging_dir = self.root / f".{key}.{uuid.uuid4().hex}.tmp"
+        staging_dir.mkdir()
+        try:
+            experiment.save_experiment(str(staging_dir / EXPERIMENT_FILE))
+            experiment.data.to_pickle(staging_dir / DATA_FILE)
+            entry_dir = self.root / key
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging_dir, entry_dir)
+        except Exception as e:
+            # The training goes on without a cache entry
+            logger.warning(f"Could not cache experiment setup {key}: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return
+        try:
+            self._evict()
+        except OSError as e:
+            # Best effort: the API pool and queue workers share the cache, the next save evicts again
+            logger.warning(f"Could not evict setup cache entries: {e}")
+    
+    def _entry_stat(self, entry_dir: Path) -> Optional[Tuple[float, int]]:
+        """Modification time and size of an entry; None if another process deleted it meanwhile"""
+        try:
+            return entry_dir.stat().st_mtime, sum(path.stat().st_size for path in entry_dir.iterdir())
+        except FileNotFoundError:
+            return None
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        stats = {}
+        for path in self.root.iterdir():
+            if path.is_dir() and not path.name.startswith("."):
+                stat = self._entry_stat(path)
+                if stat is not None:
+                    stats[path] = stat
+        entries = sorted(stats, key=lambda path: stats[path][0])
+        total = sum(size for _, size in stats.values())
+        for path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= stats[path][1]
+
+setup_cache = SetupCache()
@@ -1,14 +1,161 @@
 import pandas as pd
+import numpy as np
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from pycaret.regression import setup as setup_reg, compare_models as compare_models_reg, pull, save_model, tune_model
-from pycaret.classification import setup as setup_clf, compare_models as compare_models_clf, tune_model as tune_model_clf
+from typing import Dict, Any, Optional, List, Tuple
+from pycaret.regression import RegressionExperiment
+from pycaret.classification import ClassificationExperiment
+from sklearn.base import clone
 from app.config import settings
+from app.ml.model_selector import model_selector, problem_family
+from app.ml.setup_cache import setup_cache
+from app.ml.tuner import HyperparameterSearch
+from app.services.preprocessing_service import ImputationPipeline
 import asyncio
+import joblib
+import json
 import logging
+import math
+import os
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Bump when a change to training makes earlier models stale for identical requests
+TRAINER_VERSION = 1
+# session_id of every setup, so equal data and parameters give equal splits and folds
+SETUP_SEED = 42
+# Target quantile bins that regression samples are stratified on
+SAMPLE_STRATA = 10
+
+
+def training_n_jobs() -> int:
+    """CPU cores one training may use
+    
+    N_JOBS=-1 means all cores for a single training; with TRAINING_WORKERS
+    trainings running side by side the cores are split between them instead.
+    """
+    if settings.N_JOBS != -1:
+        return settings.N_JOBS
+    return max(1, (os.cpu_count() or 1) // max(1, settings.TRAINING_WORKERS))
+
+
+def stratified_sample(
+    df: pd.DataFrame,
+    target: str,
+    n_rows: int,
+    is_classification: bool,
+    min_per_stratum: int = 1,
+    random_state: int = 0
+) -> pd.DataFrame:
+    """About n_rows rows of df with the target's distribution preserved
+    
+    Classes (for regression, target quantile bins) are sampled in proportion to
+    their size, each keeping at least min_per_stratum rows where it has them so
+    that the sample can still be cross-validated with stratified folds.
+    """
+    if n_rows >= len(df):
+        return df
+    order = np.random.default_rng(random_state).permutation(len(df))
+    strata = df[target] if is_classification else pd.qcut(df[target], q=SAMPLE_STRATA, labels=False, duplicates="drop")
+    strata = strata.iloc[order].reset_index(drop=True)
+    grouped = strata.groupby(strata, observed=True, sort=False)
+    sizes = grouped.transform("size")
+    quota = np.maximum(np.ceil(sizes * n_rows / len(df)), np.minimum(sizes, min_per_stratum))
+    return df.iloc[order[(grouped.cumcount() < quota).to_numpy()]]
+
+
+class TrainingCancelled(Exception):
+    """Raised at a stage boundary when the training's job was cancelled"""
+
+
+class TrainingProgress:
+    """Receives stage updates and events from a training run and tells it when to stop
+    
+    The base class ignores them and never cancels; the job service passes a
+    subclass that records them in the job table, from where they are streamed.
+    """
+    
+    def update(self, stage: str, progress: float, message: Optional[str] = None):
+        pass
+    
+    def event(self, event_type: str, **data):
+        """A step within a stage, e.g. one estimator finishing cross-validation"""
+        pass
+    
+    def timing(self, estimator: str, seconds: float, **fields):
+        """How long an estimator took on data of this shape, kept for capacity planning"""
+        pass
+    
+    def past_timings(self, estimator: str) -> List[Dict[str, Any]]:
+        """Earlier timings of an estimator (estimator, rows, features, folds, seconds), to estimate its next run"""
+        return []
+    
+    def cancelled(self) -> bool:
+        return False
+    
+    def check(self, stage: str, progress: float, message: Optional[str] = None):
+        """Report the stage about to start, stopping first if cancellation was requested"""
+        if self.cancelled():
+            raise TrainingCancelled(f"Training cancelled before {stage}")
+        self.update(stage, progress, message)
+
+
+class TrainingBudget:
+    """Wall-clock budget of one training, split between model comparison and tuning
+    
+    Model comparison (screening rounds included) gets COMPARE_TIME_FRACTION of
+    what is left after setup; a candidate whose estimated time exceeds what is
+    left of it is skipped, keeping the best model so far, but the cheapest one
+    always runs if none has yet (recorded in `overruns`). Tuning gets the rest as the hyperparameter
+    search's timeout, less one cross-validation of the best model for the final
+    refit; when not even one trial fits, tuning is skipped. A budget of 0
+    seconds is unlimited.
+    """
+    
+    def __init__(self, seconds: int, compare_fraction: float):
+        self.seconds = seconds
+        self.compare_fraction = compare_fraction
+        self.started = time.monotonic()
+        self.compare_deadline = math.inf
+        self.overruns: List[str] = []
+    
+    @property
+    def limited(self) -> bool:
+        return self.seconds > 0
+    
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+    
+    def remaining(self) -> float:
+        if not self.limited:
+            return math.inf
+        return max(0.0, self.seconds - self.elapsed())
+    
+    def start_compare(self):
+        """Fix the comparison's share of the budget; screening rounds and the full comparison draw on it"""
+        self.compare_deadline = self.elapsed() + self.remaining() * self.compare_fraction
+    
+    def compare_remaining(self) -> float:
+        if not self.limited:
+            return math.inf
+        return max(0.0, self.compare_deadline - self.elapsed())
+    
+    def tune_timeout(self, trial_seconds: float) -> Optional[float]:
+        """Seconds the search may run, keeping one trial's time for the final refit; None if unlimited"""
+        if not self.limited:
+            return None
+        return self.remaining() - trial_seconds
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "seconds": self.seconds or None,
+            "elapsed": round(self.elapsed(), 2),
+            "exceeded": self.limited and self.elapsed() > self.seconds,
+            "overruns": self.overruns
+        }
+
+
 class ModelTrainer:
     async def train(
         self,
@@ -16,113 +163,586 @@ class ModelTrainer:
         target: str,
         problem_type: str,
         model_name: Optional[str] = None,
-        features: Optional[List[str]] = None
+        features: Optional[List[str]] = None,
+        dataset: Optional[str] = None,
+        imputer: Optional[ImputationPipeline] = None,
+        time_budget: Optional[int] = None,
+        successive_halving: Optional[bool] = None
     ) -> Dict[str, Any]:
         """Train and tune model with hyperparameter optimization"""
         # Run in executor to avoid blocking
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
             None,
-            self._train_sync,
-            df, target, problem_type, model_name, features
+            self.train_sync,
+            df, target, problem_type, model_name, features, dataset, imputer, time_budget, successive_halving
         )
         return result
     
-    def _train_sync(
+    def train_sync(
         self,
         df: pd.DataFrame,
         target: str,
         problem_type: str,
         model_name: Optional[str] = None,
-        features: Optional[List[str]] = None
+        features: Optional[List[str]] = None,
+        dataset: Optional[str] = None,
+        imputer: Optional[ImputationPipeline] = None,
+        time_budget: Optional[int] = None,
+        successive_halving: Optional[bool] = None,
+        dataset_version: Optional[str] = None,
+        progress: Optional[TrainingProgress] = None
     ) -> Dict[str, Any]:
-        """Synchronous training function"""
+        """Synchronous training function
+        
+        Progress is reported to `progress` at every stage boundary, which is also
+        where a cancelled training stops (PyCaret's own stages run to completion).
+        The whole run is held to time_budget seconds (default MAX_TRAINING_TIME,
+        0 = unlimited); see TrainingBudget. With successive_halving (the default
+        from HALVING_MIN_ROWS rows on) candidates are screened on subsamples and
+        only the finalists are cross-validated on all rows. Given the content
+        version of the dataset, the prepared experiment is reused from (or
+        stored in) the setup cache.
+        """
+        progress = progress or TrainingProgress()
+        budget = TrainingBudget(
+            settings.MAX_TRAINING_TIME if time_budget is None else time_budget,
+            settings.COMPARE_TIME_FRACTION
+        )
         try:
-            # Validate input data
-            if df.empty:
-                raise ValueError("Dataset is empty")
-            
-            if target not in df.columns:
-                raise ValueError(f"Target column '{target}' not found in dataset. Available columns: {list(df.columns)}")
-            
-            # Check for missing values in target
-            missing_target = df[target].isnull().sum()
-            if missing_target > 0:
-                # Remove rows with missing target values
-                df = df.dropna(subset=[target])
-                if df.empty:
-                    raise ValueError(f"After removing rows with missing target values, dataset is empty")
-            
-            # Select features if specified
-            if features:
-                missing_features = [f for f in features if f not in df.columns]
-                if missing_features:
-                    raise ValueError(f"Features not found in dataset: {missing_features}")
-                df = df[features + [target]]
+            dataset_rows = len(df)
+            df = self._prepare_frame(df, target, features)
             
             # Ensure model storage directory exists
             model_path = Path(settings.MODEL_STORAGE_PATH)
             model_path.mkdir(parents=True, exist_ok=True)
             
             # Normalize problem type for PyCaret (handle variations)
-            is_classification = problem_type.lower() in ["binary classification", "multi-class classification", "classification"]
+            is_classification = problem_family(problem_type) == "classification"
             
-            # Setup PyCaret - use only supported parameters for 3.3.0
-            if not is_classification:  # Regression
-                setup_reg(df, target=target, n_jobs=settings.N_JOBS)
-                best_model = compare_models_reg()
-                # Hyperparameter tuning - skip if model doesn't support it
-                try:
-                    tuned_model = tune_model(best_model, n_iter=10)
-                    logger.info(f"Model tuned successfully: {type(best_model).__name__}")
-                except (ValueError, TypeError) as tune_error:
-                    # If tuning fails (empty parameter grid), use the best model as-is
-                    error_msg = str(tune_error).lower()
-                    if "parameter grid" in error_msg or "empty" in error_msg:
-                        logger.warning(f"Model {type(best_model).__name__} doesn't support tuning, using untuned model")
-                        tuned_model = best_model
-                    else:
-                        raise
-            else:  # Classification
-                setup_clf(df, target=target, n_jobs=settings.N_JOBS)
-                best_model = compare_models_clf()
-                # Hyperparameter tuning - skip if model doesn't support it
-                try:
-                    tuned_model = tune_model_clf(best_model, n_iter=10)
-                    logger.info(f"Model tuned successfully: {type(best_model).__name__}")
-                except (ValueError, TypeError) as tune_error:
-                    # If tuning fails (empty parameter grid), use the best model as-is
-                    error_msg = str(tune_error).lower()
-                    if "parameter grid" in error_msg or "empty" in error_msg:
-                        logger.warning(f"Model {type(best_model).__name__} doesn't support tuning, using untuned model")
-                        tuned_model = best_model
-                    else:
-                        raise
+            progress.check("setup", 0.05, "Preparing the experiment")
+            experiment, setup_cached = self._setup_experiment(df, target, is_classification, dataset_version)
+            # Cross-validate the selector's shortlist for this data shape, not the whole model zoo
+            candidates = model_selector.shortlist(
+                problem_type,
+                n_rows=len(df),
+                n_features=len(df.columns) - 1,
+                max_candidates=settings.COMPARE_MAX_CANDIDATES,
+                available=experiment.models().index.tolist()
+            )
+            budget.start_compare()
+            screening, observations = [], []
+            if successive_halving is None:
+                successive_halving = len(df) >= settings.HALVING_MIN_ROWS
+            if successive_halving:
+                candidates, screening, observations = self._successive_halving(
+                    experiment, df, target, is_classification, candidates, budget, progress
+                )
+            models, leaderboard = self._compare(
+                experiment, candidates, problem_type, is_classification, len(df), budget, progress, observations
+            )
+            best_model = models[leaderboard.index[0]]
+            metrics_df = leaderboard
             
-            # Get metrics
-            metrics_df = pull()
+            # One trial cross-validates a model once: folds x its mean fit time
+            trial_seconds = float(leaderboard.iloc[0]["TT (Sec)"]) * experiment.get_config("fold_generator").get_n_splits()
+            timeout = budget.tune_timeout(trial_seconds)
+            tuning = None
+            if timeout is not None and timeout < trial_seconds:
+                logger.warning(f"Time budget of {budget.seconds}s exhausted, skipping tuning of {type(best_model).__name__}")
+                tuned_model = best_model
+            else:
+                progress.check("tune", 0.7, f"Tuning the top {min(settings.TUNE_TOP_K, len(leaderboard))} models")
+                tuned_model, tuning, tuned_metrics = self._tune(
+                    experiment, models, leaderboard, is_classification, timeout, progress
+                )
+                if tuned_metrics is not None:
+                    metrics_df = tuned_metrics
             
             # Save model
-            model_id = f"model_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
-            save_model(tuned_model, str(model_path / model_id))
+            progress.check("save", 0.95, "Saving the model")
+            model_id = self._new_model_id()
+            experiment.save_model(tuned_model, str(model_path / model_id))
+            self._save_metadata(model_path, model_id, self._metadata(
+                df, target, problem_type, dataset, imputer, tuned_model, dataset_rows, dataset_version
+            ))
             
             return {
                 "model_id": model_id,
                 "model_type": problem_type,
                 "metrics": metrics_df.to_dict("records"),
+                "candidates": candidates,
+                "screening": screening,
+                "setup_cached": setup_cached,
+                "tuning": tuning,
+                "time_budget": budget.summary(),
                 "status": "completed"
             }
+        except TrainingCancelled as e:
+            return self._cancelled(e)
         except Exception as e:
-            import traceback
-            error_details = {
-                "error": str(e),
-                "error_type": type(e).__name__,
-                "traceback": traceback.format_exc()
-            }
+            return self._failed(e)
+    
+    def latest_model(self, dataset: str, target: Optional[str] = None) -> Optional[str]:
+        """Id of the most recently trained model on dataset (and target, if given)"""
+        latest = None
+        for metadata_path in Path(settings.MODEL_STORAGE_PATH).glob("model_*.json"):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            if metadata.get("dataset") != dataset or (target and metadata.get("target") != target):
+                continue
+            # Models from before trained_at was recorded sort by the timestamp in their id
+            if latest is None or (metadata.get("trained_at", ""), metadata["model_id"]) > (latest.get("trained_at", ""), latest["model_id"]):
+                latest = metadata
+        return latest["model_id"] if latest else None
+    
+    def _continuation(self, estimator) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Parameters and fit arguments that add INCREMENTAL_BOOST_ROUNDS rounds to a fitted booster"""
+        rounds = settings.INCREMENTAL_BOOST_ROUNDS
+        name = type(estimator).__name__
+        if name.startswith("LGBM"):
+            return {"n_estimators": rounds}, {"init_model": estimator.booster_}
+        if name.startswith("XGB"):
+            return {"n_estimators": rounds}, {"xgb_model": estimator.get_booster()}
+        if name.startswith("CatBoost"):
+            return {"iterations": rounds}, {"init_model": estimator}
+        return None
+    
+    def retrain_sync(
+        self,
+        df: pd.DataFrame,
+        base_model_id: str,
+        target: Optional[str] = None,
+        dataset: Optional[str] = None,
+        imputer: Optional[ImputationPipeline] = None,
+        dataset_version: Optional[str] = None,
+        lineage: Optional[Dict[str, int]] = None,
+        progress: Optional[TrainingProgress] = None
+    ) -> Dict[str, Any]:
+        """Retrain a saved model's estimator on the dataset's current rows, without comparison or tuning
+        
+        partial_fit estimators are updated with the rows appended since the base
+        model's dataset version (per `lineage`), boosters continue from the saved
+        one, and anything else is refit.
+        """
+        progress = progress or TrainingProgress()
+        try:
+            model_path = Path(settings.MODEL_STORAGE_PATH)
+            base = self._load_metadata(model_path, base_model_id)
+            if not base.get("target"):
+                raise ValueError(f"Model {base_model_id} has no training metadata to retrain from")
+            if target and target != base["target"]:
+                raise ValueError(f"Model {base_model_id} predicts '{base['target']}', not '{target}'")
+            target, problem_type, features = base["target"], base["problem_type"], base["features"]
+            base_pipeline = joblib.load(model_path / f"{base_model_id}.pkl")
+            estimator = base_pipeline.steps[-1][1]
+            estimator_name = type(estimator).__name__
+            dataset_rows = len(df)
+            trained_rows = base.get("dataset_rows")
+            model_id = self._new_model_id()
+            base_version = base.get("dataset_version")
+            if hasattr(estimator, "partial_fit") and base_version is not None and base_version == dataset_version:
+                raise ValueError(f"No rows were appended since model {base_model_id} was trained")
+            # Only rows appended to the very content the base model saw are new to it
+            appended = base_version is not None and trained_rows is not None and (lineage or {}).get(base_version) == trained_rows
+            
+            if hasattr(estimator, "partial_fit") and appended:
+                progress.check("fit", 0.1, f"Updating {estimator_name} with {dataset_rows - trained_rows:,} new rows")
+                new_rows = self._prepare_frame(df.iloc[trained_rows:], target, features)
+                X, y = base_pipeline.transform(new_rows.drop(columns=[target]), new_rows[target])
+                score_before = estimator.score(X, y)
+                estimator.partial_fit(X, y)
+                metrics = [{
+                    "Model": estimator_name,
+                    "New rows": len(new_rows),
+                    "Score before update": score_before,
+                    "Score after update": estimator.score(X, y)
+                }]
+                mode = "partial_fit"
+                progress.check("save", 0.95, "Saving the model")
+                joblib.dump(base_pipeline, model_path / f"{model_id}.pkl")
+                df = self._prepare_frame(df, target, features)
+            else:
+                df = self._prepare_frame(df, target, features)
+                progress.check("setup", 0.05, "Preparing the experiment")
+                experiment, _ = self._setup_experiment(
+                    df, target, problem_family(problem_type) == "classification", dataset_version
+                )
+                model, mode = None, "refit"
+                continuation = self._continuation(estimator)
+                if continuation is not None:
+                    params, fit_kwargs = continuation
+                    progress.check("fit", 0.3, f"Continuing {estimator_name} for {settings.INCREMENTAL_BOOST_ROUNDS} rounds")
+                    try:
+                        model = experiment.create_model(
+                            clone(estimator).set_params(**params), cross_validation=False, fit_kwargs=fit_kwargs
+                        )
+                        mode = "warm_start"
+                    except Exception as e:
+                        logger.warning(f"Could not continue {estimator_name} from {base_model_id}, refitting it: {e}")
+                if model is None:
+                    progress.check("fit", 0.3, f"Refitting {estimator_name}")
+                    model = experiment.create_model(clone(estimator), cross_validation=False)
+                # Score on the hold-out set
+                experiment.predict_model(model, verbose=False)
+                metrics = experiment.pull().to_dict("records")
+                progress.check("save", 0.95, "Saving the model")
+                experiment.save_model(model, str(model_path / model_id))
+            
+            self._save_metadata(model_path, model_id, {
+                **self._metadata(df, target, problem_type, dataset, imputer, estimator, dataset_rows, dataset_version),
+                "base_model_id": base_model_id,
+                "retrain_mode": mode
+            })
             return {
-                "status": "failed",
-                "error": str(e),
-                "details": error_details
+                "model_id": model_id,
+                "model_type": problem_type,
+                "metrics": metrics,
+                "base_model_id": base_model_id,
+                "retrain_mode": mode,
+                "status": "completed"
             }
+        except TrainingCancelled as e:
+            return self._cancelled(e)
+        except Exception as e:
+            return self._failed(e)
+    
+    def _compare(
+        self,
+        experiment,
+        candidates: List[str],
+        problem_type: str,
+        is_classification: bool,
+        n_rows: int,
+        budget: TrainingBudget,
+        progress: TrainingProgress,
+        observations: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        """Cross-validate the candidates one at a time and return the models by id and the leaderboard
+        
+        Does what compare_models(include=candidates, budget_time=...) does, but
+        reports every estimator as it starts and finishes (fold scores, wall time)
+        and records its timing. A candidate is skipped when its time, estimated
+        from the observations (screening runs), the candidates run before it and
+        its recorded timings, exceeds what is left of the comparison's budget;
+        until one candidate has been cross-validated, the cheapest left runs anyway.
+        Each create_model also refits its estimator on the whole training split,
+        about 1/folds more work than compare_models, which refits only the winner.
+        """
+        folds = experiment.get_config("fold_generator").get_n_splits()
+        n_features = len(experiment.get_config("X_train").columns)
+        sort_metric = "Accuracy" if is_classification else "R2"
+        observations = list(observations or [])
+        past_timings = {model_id: progress.past_timings(model_id) for model_id in candidates}
+        models, rows = {}, []
+        for index, model_id in enumerate(candidates):
+            estimates = {
+                other: model_selector.estimate_seconds(other, n_rows, n_features, folds, observations + past_timings[other])
+                for other in candidates[index:]
+            }
+            estimate = estimates[model_id]
+            remaining = budget.compare_remaining()
+            over_budget = (estimate is not None and estimate > remaining) or remaining <= 0
+            # The budget caps the search rather than failing it: with nothing cross-validated yet
+            # the cheapest candidate left (unknown costs last, then shortlist order) runs regardless
+            cheapest = min(candidates[index:], key=lambda other: math.inf if estimates[other] is None else estimates[other])
+            if over_budget and not rows and model_id == cheapest:
+                logger.warning(f"Cross-validating {model_id} over the time budget of {budget.seconds}s")
+                budget.overruns.append(model_id)
+                progress.event(
+                    "budget_overrun",
+                    estimator=model_id,
+                    remaining_seconds=round(remaining, 1),
+                    estimated_seconds=round(estimate, 1) if estimate is not None else None
+                )
+            elif over_budget:
+                progress.event(
+                    "estimator_skipped",
+                    estimator=model_id,
+                    reason="would overrun the time budget",
+                    estimated_seconds=round(estimate, 1) if estimate is not None else None
+                )
+                continue
+            progress.check(
+                "compare", 0.4 + 0.3 * index / len(candidates),
+                f"Cross-validating {model_id} ({index + 1}/{len(candidates)})"
+            )
+            progress.event(
+                "estimator_started",
+                estimator=model_id,
+                index=index,
+                total=len(candidates),
+                folds=folds,
+                estimated_seconds=round(estimate, 1) if estimate is not None else None
+            )
+            started = time.monotonic()
+            try:
+                model = experiment.create_model(model_id, verbose=False)
+            except Exception as e:
+                # compare_models skips failing estimators too
+                logger.warning(f"Estimator {model_id} failed: {e}")
+                progress.event("estimator_failed", estimator=model_id, error=str(e))
+                continue
+            seconds = time.monotonic() - started
+            # Rows 0..folds-1 are the folds, then Mean and Std
+            fold_table = experiment.pull()
+            mean = fold_table.loc["Mean"].to_dict()
+            progress.event(
+                "estimator_finished",
+                estimator=model_id,
+                model=type(model).__name__,
+                seconds=round(seconds, 2),
+                fold_seconds=round(seconds / folds, 2),
+                fold_scores=fold_table[sort_metric].iloc[:folds].tolist(),
+                mean=mean
+            )
+            progress.timing(
+                model_id, seconds,
+                problem_type=problem_type, rows=n_rows, features=n_features, folds=folds, score=mean.get(sort_metric)
+            )
+            observations.append({
+                "estimator": model_id, "rows": n_rows, "features": n_features, "folds": folds, "seconds": seconds
+            })
+            models[model_id] = model
+            rows.append({"Model": type(model).__name__, **mean, "TT (Sec)": round(seconds / folds, 2), "id": model_id})
+        if not rows:
+            raise ValueError(f"None of the candidate models could be trained: {candidates}")
+        leaderboard = pd.DataFrame(rows).set_index("id").sort_values(sort_metric, ascending=False)
+        return models, leaderboard
+    
+    def _tune(
+        self,
+        experiment,
+        models: Dict[str, Any],
+        leaderboard: pd.DataFrame,
+        is_classification: bool,
+        timeout: Optional[float],
+        progress: TrainingProgress
+    ) -> Tuple[Any, Optional[Dict[str, Any]], Optional[pd.DataFrame]]:
+        """Tune the top TUNE_TOP_K leaderboard models together; returns the model to keep, a summary and its CV table
+        
+        Runs a HyperparameterSearch on the experiment's transformed training
+        split and folds, reporting every trial. The winning configuration is
+        cross-validated once more by PyCaret and kept only if it beats the
+        untuned leader, as tune_model(choose_better=True) does; otherwise the
+        leader is returned with no CV table.
+        """
+        sort_metric = "Accuracy" if is_classification else "R2"
+        best_model = models[leaderboard.index[0]]
+        distributions = experiment.models(internal=True)["Tune Distributions"]
+        # Estimators without a search space (e.g. Naive Bayes) cannot be tuned
+        top = [model_id for model_id in leaderboard.index[:settings.TUNE_TOP_K] if distributions.get(model_id)]
+        if not top:
+            logger.warning(f"Model {type(best_model).__name__} doesn't support tuning, using untuned model")
+            return best_model, None, None
+        
+        X = experiment.get_config("X_train_transformed")
+        y = experiment.get_config("y_train_transformed")
+        folds = list(experiment.get_config("fold_generator").split(X, y))
+        search = HyperparameterSearch(
+            {model_id: models[model_id] for model_id in top},
+            {model_id: distributions[model_id] for model_id in top},
+            scoring="accuracy" if is_classification else "r2",
+            n_jobs=training_n_jobs(),
+            max_trials=settings.TUNE_MAX_TRIALS,
+            patience=settings.TUNE_PATIENCE,
+            seed=SETUP_SEED
+        )
+        progress.event(
+            "tune_started",
+            estimators=top,
+            max_trials=settings.TUNE_MAX_TRIALS,
+            timeout=round(timeout, 1) if timeout is not None else None
+        )
+        started = time.monotonic()
+        summary = search.run(
+            X, y, folds, timeout,
+            on_trial=lambda trial: progress.event("tune_trial", **trial),
+            should_stop=progress.cancelled
+        )
+        
+        tuned_model, tuned_metrics = best_model, None
+        if summary["best"] is not None:
+            model_id, params = summary["best"]["model_id"], summary["best"]["params"]
+            progress.check("tune", 0.9, f"Cross-validating the tuned {model_id}")
+            candidate = experiment.create_model(clone(models[model_id]).set_params(**params), verbose=False)
+            fold_table = experiment.pull()
+            if fold_table.loc["Mean", sort_metric] > leaderboard.iloc[0][sort_metric]:
+                tuned_model, tuned_metrics = candidate, fold_table
+                logger.info(f"Model tuned successfully: {type(candidate).__name__}")
+        summary = {
+            **summary,
+            "estimators_tuned": top,
+            "seconds": round(time.monotonic() - started, 2),
+            "tuned": tuned_metrics is not None
+        }
+        progress.event("tune_finished", **summary)
+        return tuned_model, summary, tuned_metrics
+    
+    def _successive_halving(
+        self,
+        experiment,
+        df: pd.DataFrame,
+        target: str,
+        is_classification: bool,
+        candidates: List[str],
+        budget: TrainingBudget,
+        progress: TrainingProgress
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Screen candidates on growing stratified subsamples; returns the finalists, the rounds and their timings
+        
+        Each round cross-validates the survivors with HALVING_FOLDS folds on a
+        sample and keeps the top 1/HALVING_ETA (at least HALVING_FINALISTS) for the
+        next round, on HALVING_ETA times as many rows. Rounds stop once the
+        finalists are left, the sample would be the whole dataset, or the
+        comparison's share of the time budget is spent; a round stops starting
+        candidates once it is.
+        """
+        survivors, rounds, observations = list(candidates), [], []
+        sample_rows = settings.HALVING_MIN_SAMPLE
+        while len(survivors) > settings.HALVING_FINALISTS and sample_rows < len(df) and budget.compare_remaining() > 0:
+            progress.check(
+                "screen", min(0.15 + 0.05 * len(rounds), 0.35),
+                f"Screening {len(survivors)} models on {sample_rows:,} rows"
+            )
+            sample = stratified_sample(df, target, sample_rows, is_classification, settings.HALVING_FOLDS, len(rounds))
+            # A throwaway experiment on the sample; the full one keeps its setup for the finalists
+            screen = type(experiment)()
+            screen.setup(sample, target=target, n_jobs=training_n_jobs(), fold=settings.HALVING_FOLDS, verbose=False)
+            keep = max(settings.HALVING_FINALISTS, math.ceil(len(survivors) / settings.HALVING_ETA))
+            screen.compare_models(
+                include=survivors,
+                n_select=keep,
+                budget_time=budget.compare_remaining() / 60 if budget.limited else None,
+                verbose=False
+            )
+            # The leaderboard is indexed by model id, best first; failed and unstarted candidates are left out
+            board = screen.pull()
+            ranked = [model_id for model_id in board.index if model_id in survivors]
+            n_features = len(screen.get_config("X_train").columns)
+            for model_id in ranked:
+                # "TT (Sec)" is the mean fit time of one fold
+                observations.append({
+                    "estimator": model_id,
+                    "rows": len(sample),
+                    "features": n_features,
+                    "folds": settings.HALVING_FOLDS,
+                    "seconds": float(board.loc[model_id, "TT (Sec)"]) * settings.HALVING_FOLDS
+                })
+            rounds.append({"rows": len(sample), "candidates": survivors, "kept": ranked[:keep]})
+            progress.event("screening_round", **rounds[-1])
+            survivors = ranked[:keep]
+            sample_rows *= settings.HALVING_ETA
+        return survivors, rounds, observations
+    
+    def _prepare_frame(self, df: pd.DataFrame, target: str, features: Optional[List[str]]) -> pd.DataFrame:
+        """Validate the target and features and drop rows without a target value"""
+        # Validate input data
+        if df.empty:
+            raise ValueError("Dataset is empty")
+        
+        if target not in df.columns:
+            raise ValueError(f"Target column '{target}' not found in dataset. Available columns: {list(df.columns)}")
+        
+        # Check for missing values in target
+        missing_target = df[target].isnull().sum()
+        if missing_target > 0:
+            # Remove rows with missing target values
+            df = df.dropna(subset=[target])
+            if df.empty:
+                raise ValueError(f"After removing rows with missing target values, dataset is empty")
+        
+        # Select features if specified
+        if features:
+            missing_features = [f for f in features if f not in df.columns]
+            if missing_features:
+                raise ValueError(f"Features not found in dataset: {missing_features}")
+            df = df[features + [target]]
+        return df
+    
+    def _setup_experiment(self, df: pd.DataFrame, target: str, is_classification: bool, dataset_version: Optional[str]):
+        """A set-up experiment for df, from the setup cache when dataset_version is known; returns it and whether it was cached"""
+        # Each training gets its own experiment object: PyCaret's functional API keeps a
+        # single global experiment per process, which concurrent trainings would overwrite
+        experiment = ClassificationExperiment() if is_classification else RegressionExperiment()
+        
+        # Setup PyCaret - use only supported parameters for 3.3.0
+        # Fixed seed: the cached split and folds are the ones a fresh setup would make
+        setup_params = {"n_jobs": training_n_jobs(), "session_id": SETUP_SEED}
+        setup_key = setup_cache.key(
+            dataset_version, target, list(df.columns), type(experiment).__name__, setup_params
+        ) if dataset_version else None
+        cached_experiment = setup_cache.load(setup_key, type(experiment)) if setup_key else None
+        if cached_experiment is not None:
+            logger.info(f"Reusing cached experiment setup {setup_key}")
+            return cached_experiment, True
+        experiment.setup(df, target=target, **setup_params)
+        if setup_key:
+            setup_cache.save(setup_key, experiment)
+        return experiment, False
+    
+    @staticmethod
+    def _new_model_id() -> str:
+        # Suffixed so trainings finishing in the same second don't overwrite each other
+        return f"model_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    
+    def _metadata(
+        self,
+        df: pd.DataFrame,
+        target: str,
+        problem_type: str,
+        dataset: Optional[str],
+        imputer: Optional[ImputationPipeline],
+        model,
+        dataset_rows: int,
+        dataset_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return {
+            "dataset": dataset,
+            "target": target,
+            "problem_type": problem_type,
+            "features": [col for col in df.columns if col != target],
+            "estimator": type(model).__name__,
+            # Rows of the dataset when it was trained on; later rows are new to the model
+            "dataset_rows": dataset_rows,
+            # Content version trained on, to tell appended rows from a re-upload
+            "dataset_version": dataset_version,
+            "trained_at": pd.Timestamp.now().isoformat(),
+            # Fill values only: prediction inputs are imputed exactly as the training data was
+            "imputer": imputer.to_dict(include_sketches=False) if imputer else None
+        }
+    
+    @staticmethod
+    def _cancelled(e: TrainingCancelled) -> Dict[str, Any]:
+        return {
+            "status": "cancelled",
+            "error": str(e)
+        }
+    
+    @staticmethod
+    def _failed(e: Exception) -> Dict[str, Any]:
+        import traceback
+        error_details = {
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "traceback": traceback.format_exc()
+        }
+        return {
+            "status": "failed",
+            "error": str(e),
+            "details": error_details
+        }
+    
+    def _load_metadata(self, model_path: Path, model_id: str) -> Dict[str, Any]:
+        metadata_path = model_path / f"{model_id}.json"
+        if not metadata_path.exists():
+            raise FileNotFoundError(f"Model {model_id} not found in {model_path}")
+        with open(metadata_path) as f:
+            return json.load(f)
+    
+    def _save_metadata(self, model_path: Path, model_id: str, metadata: Dict[str, Any]):
+        """Write the model's sidecar <model_id>.json, read back by ModelService"""
+        with open(model_path / f"{model_id}.json", "w") as f:
+            json.dump({"model_id": model_id, **metadata}, f, indent=2)
 
 model_trainer = ModelTrainer()
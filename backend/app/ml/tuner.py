@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import optuna
+from optuna.trial import TrialState
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+# Estimator parameters that set its own thread count; trials run side by side instead
+THREAD_PARAMS = ("n_jobs", "thread_count")
+# Trials that survive each pruning rung; rungs fall after 1, 3, 9... folds
+PRUNING_REDUCTION_FACTOR = 3
+
+
+def _suggest(trial: optuna.Trial, name: str, distribution):
+    """Sample a value from one of PyCaret's tuning distributions"""
+    kind = type(distribution).__name__
+    if kind == "CategoricalDistribution":
+        # By index: the values may be anything (dicts, estimators), optuna takes primitives only
+        values = list(distribution.values)
+        return values[trial.suggest_categorical(name, list(range(len(values))))]
+    if kind == "IntUniformDistribution":
+        return trial.suggest_int(name, distribution.lower, distribution.upper, log=distribution.log)
+    if kind == "DiscreteUniformDistribution":
+        return trial.suggest_float(name, distribution.lower, distribution.upper, step=distribution.q)
+    return trial.suggest_float(name, distribution.lower, distribution.upper, log=distribution.log)
+
+
+class HyperparameterSearch:
+    """Bayesian search over several estimators at once, with fold-level pruning and a plateau stop
+    
+    One optuna study covers all the estimators: each trial picks one of them
+    and samples its hyperparameters from PyCaret's tuning distributions with
+    TPE, so trials drift towards the estimators that score better. A trial
+    cross-validates fold by fold and reports its running mean score, and the
+    successive-halving pruner (ASHA) stops the trials that fall behind the
+    others after the same number of folds.
+    
+    Trials run n_jobs at a time on one thread each. The search ends after
+    max_trials, at the timeout, once `patience` trials in a row have not
+    improved on the best score, or as soon as should_stop() returns True.
+    """
+    
+    def __init__(
+        self,
+        estimators: Dict[str, Any],
+        distributions: Dict[str, Dict[str, Any]],
+        scoring: str,
+        n_jobs: int = 1,
+        max_trials: int = 50,
+        patience: int = 15,
+        seed: int = 0
+    ):
+        self.estimators = estimators
+        self.distributions = distributions
+        self.scorer = get_scorer(scoring)
+        self.n_jobs = max(1, n_jobs)
+        self.max_trials = max_trials
+        self.patience = patience
+        self.seed = seed
+    
+    def run(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        folds: List[Tuple[np.ndarray, np.ndarray]],
+        timeout: Optional[float] = None,
+        on_trial: Optional[Callable[[Dict[str, Any]], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """Search and return the best trial ("model_id", "params", "score"; None if no trial completed) and per-estimator bests"""
+        study = optuna.create_study(
+            direction="maximize",
+            sampler=optuna.samplers.TPESampler(seed=self.seed),
+            pruner=optuna.pruners.SuccessiveHalvingPruner(min_resource=1, reduction_factor=PRUNING_REDUCTION_FACTOR)
+        )
+        stopped = {"reason": "max_trials"}
+        
+        def callback(study: optuna.Study, trial: optuna.trial.FrozenTrial):
+            if on_trial:
+                on_trial(self._describe(trial))
+            if should_stop and should_stop():
+                stopped["reason"] = "cancelled"
+                study.stop()
+                return
+            best = self._best(study)
+            # Counted in finished trials: with parallel trials the best may finish after later-numbered ones
+            if best is not None and sum(
+                other.datetime_complete is not None and other.datetime_complete > best.datetime_complete
+                for other in study.get_trials(deepcopy=False)
+            ) >= self.patience:
+                stopped["reason"] = "plateau"
+                study.stop()
+        
+        study.optimize(
+            lambda trial: self._objective(trial, X, y, folds),
+            n_trials=self.max_trials,
+            timeout=timeout,
+            n_jobs=self.n_jobs,
+            # A configuration the estimator rejects fails its trial, not the search
+            catch=(Exception,),
+            callbacks=[callback]
+        )
+        trials = study.trials
+        if timeout is not None and stopped["reason"] == "max_trials" and len(trials) < self.max_trials:
+            stopped["reason"] = "timeout"
+        best = self._best(study)
+        by_estimator = {}
+        for trial in trials:
+            if trial.state != TrialState.COMPLETE:
+                continue
+            model_id = trial.params["model"]
+            if model_id not in by_estimator or trial.value > by_estimator[model_id]["score"]:
+                by_estimator[model_id] = {"params": trial.user_attrs["params"], "score": trial.value, "trial": trial.number}
+        return {
+            "best": {
+                "model_id": best.params["model"],
+                "params": best.user_attrs["params"],
+                "score": best.value,
+                "trial": best.number
+            } if best else None,
+            "estimators": by_estimator,
+            "trials": len(trials),
+            "pruned": sum(trial.state == TrialState.PRUNED for trial in trials),
+            "failed": sum(trial.state == TrialState.FAIL for trial in trials),
+            "stopped": stopped["reason"]
+        }
+    
+    def _objective(self, trial: optuna.Trial, X: pd.DataFrame, y: pd.Series, folds: List[Tuple[np.ndarray, np.ndarray]]) -> float:
+        model_id = trial.suggest_categorical("model", list(self.estimators))
+        # Prefixed: estimators share parameter names with different ranges
+        params = {
+            name: _suggest(trial, f"{model_id}__{name}", distribution)
+            for name, distribution in self.distributions[model_id].items()
+        }
+        trial.set_user_attr("params", params)
+        estimator = clone(self.estimators[model_id]).set_params(**params)
+        estimator.set_params(**{name: 1 for name in THREAD_PARAMS if name in estimator.get_params()})
+        scores = []
+        for train_index, test_index in folds:
+            fitted = clone(estimator).fit(X.iloc[train_index], y.iloc[train_index])
+            scores.append(self.scorer(fitted, X.iloc[test_index], y.iloc[test_index]))
+            trial.report(float(np.mean(scores)), len(scores))
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+        return float(np.mean(scores))
+    
+    @staticmethod
+    def _best(study: optuna.Study) -> Optional[optuna.trial.FrozenTrial]:
+        # study.best_trial raises until a trial completes
+        complete = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+        return max(complete, key=lambda trial: trial.value) if complete else None
+    
+    @staticmethod
+    def _describe(trial: optuna.trial.FrozenTrial) -> Dict[str, Any]:
+        return {
+            "trial": trial.number,
+            "estimator": trial.params.get("model"),
+            "state": trial.state.name.lower(),
+            "score": trial.value,
+            "folds": len(trial.intermediate_values),
+            "params": trial.user_attrs.get("params"),
+            "seconds": round(trial.duration.total_seconds(), 2) if trial.duration else None
+        }
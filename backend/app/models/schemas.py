@@ -9,6 +9,12 @@ class UploadResponse(BaseModel):
     dtypes: Dict[str, str]
     memory_usage: int
     file_path: str
+    fingerprint: Optional[str] = None
+    deduplicated: bool = False
+
+class AppendResponse(UploadResponse):
+    appended_rows: int
+    preprocessing: Optional[Dict[str, Any]] = None
 
 class PreprocessResponse(BaseModel):
     original_shape: tuple
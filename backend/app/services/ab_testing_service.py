@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List, Optional
+from scipy import stats
+import asyncio
+import functools
+import warnings
+
+# Bootstrap replicates drawn per matrix product
+BOOTSTRAP_BATCH = 256
+CORRECTIONS = ("holm", "bh", "none")
+# Group names picked as the control arm when none is given
+CONTROL_NAMES = ("control", "Control", "A", "a")
+
+
+def adjust_p_values(p_values: np.ndarray, method: str) -> np.ndarray:
+    """Holm (family-wise error) or Benjamini-Hochberg (false discovery rate) adjusted p-values; NaNs are left out"""
+    adjusted = np.full(p_values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    if method == "none" or len(valid) == 0:
+        adjusted[valid] = p_values[valid]
+        return adjusted
+    m = len(valid)
+    order = valid[np.argsort(p_values[valid], kind="stable")]
+    ranked = p_values[order]
+    if method == "holm":
+        ranked = np.maximum.accumulate((m - np.arange(m)) * ranked)
+    else:
+        ranked = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    adjusted[order] = np.minimum(ranked, 1.0)
+    return adjusted
+
+
+class ABTestingService:
+    """Multi-arm, multi-metric A/B tests computed from grouped aggregates
+    
+    Every arm is compared with the control on every metric in one pass: rows are
+    reduced with bincount to per-(arm, bucket) sums, sums of squares and counts,
+    and everything after that works on those small arrays. Means and variances
+    give Welch t-tests; p-values are corrected across all comparisons at once.
+    
+    Confidence intervals use a bucket bootstrap: rows are randomly assigned to
+    `buckets` buckets per arm and whole buckets are resampled, so a replicate is
+    a multinomial weight vector times the bucket sums. Replicates are drawn in
+    batches of BOOTSTRAP_BATCH as matrix products, independent of the row count.
+    With fewer rows per arm than buckets this approaches the ordinary bootstrap.
+    """
+    
+    def _control(self, groups: List[Any], control: Optional[Any]) -> int:
+        labels = [str(group) for group in groups]
+        if control is not None:
+            if str(control) not in labels:
+                raise ValueError(f"Control group '{control}' not found. Groups: {labels}")
+            return labels.index(str(control))
+        for name in CONTROL_NAMES:
+            if name in labels:
+                return labels.index(name)
+        return 0
+    
+    def _metric_columns(self, df: pd.DataFrame, group_column: str, metrics: Optional[List[str]]) -> List[str]:
+        # Decided from dtypes alone; select_dtypes would copy the frame
+        numeric = [col for col, dtype in df.dtypes.items() if pd.api.types.is_numeric_dtype(dtype)]
+        if metrics is None:
+            metrics = [col for col in numeric if col != group_column]
+        missing = [col for col in metrics if col not in df.columns]
+        if missing:
+            raise ValueError(f"Metric columns not found in dataset: {missing}")
+        non_numeric = [col for col in metrics if col not in numeric]
+        if non_numeric:
+            raise ValueError(f"Metric columns must be numeric: {non_numeric}")
+        if not metrics:
+            raise ValueError("No numeric metric columns to test")
+        return metrics
+    
+    async def run(self, df: pd.DataFrame, **options) -> Dict[str, Any]:
+        """Compare every group with the control on every metric (see _run_sync for the options)"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(self._run_sync, df, **options))
+    
+    def _run_sync(
+        self,
+        df: pd.DataFrame,
+        group_column: str = "group",
+        metrics: Optional[List[str]] = None,
+        control: Optional[Any] = None,
+        alpha: float = 0.05,
+        correction: str = "holm",
+        n_bootstrap: int = 1000,
+        confidence: float = 0.95,
+        buckets: int = 256,
+        seed: int = 0
+    ) -> Dict[str, Any]:
+        """Synchronous test run"""
+        if group_column not in df.columns:
+            raise ValueError(f"Group column '{group_column}' not found in dataset")
+        if correction not in CORRECTIONS:
+            raise ValueError(f"Unknown correction '{correction}'. Available: {list(CORRECTIONS)}")
+        if n_bootstrap < 0:
+            raise ValueError("n_bootstrap must be 0 or more")
+        if not 0 < alpha < 1 or not 0 < confidence < 1:
+            raise ValueError("alpha and confidence must be between 0 and 1")
+        metrics = self._metric_columns(df, group_column, metrics)
+        
+        codes, groups = pd.factorize(df[group_column], sort=True)
+        groups = groups.tolist()
+        if len(groups) < 2:
+            raise ValueError(f"Need at least two groups in '{group_column}', found {len(groups)}")
+        control_index = self._control(groups, control)
+        n_groups, n_metrics = len(groups), len(metrics)
+        group_sizes = np.bincount(codes[codes >= 0], minlength=n_groups)
+        
+        rng = np.random.default_rng(seed)
+        # Rows without a group are dropped; slice(None) avoids copying every column when there are none
+        labelled = codes >= 0 if (codes < 0).any() else slice(None)
+        cells = codes[labelled].astype(np.int64) * buckets
+        cells += rng.integers(0, buckets, len(cells))
+        size = n_groups * buckets
+        cell_counts = np.bincount(cells, minlength=size).reshape(n_groups, buckets)
+        
+        sums = np.zeros((n_groups, buckets, n_metrics))
+        squares = np.zeros((n_groups, buckets, n_metrics))
+        counts = np.zeros((n_groups, buckets, n_metrics))
+        shifts = np.zeros(n_metrics)
+        for j, col in enumerate(metrics):
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[labelled]
+            valid = ~np.isnan(values)
+            has_missing = not valid.all()
+            # Shift by the overall mean so sums of squares don't lose precision
+            shifts[j] = (values[valid].mean() if valid.any() else 0.0) if has_missing else values.mean()
+            centered = values - shifts[j]
+            if has_missing:
+                centered[~valid] = 0.0
+                counts[:, :, j] = np.bincount(cells, weights=valid, minlength=size).reshape(n_groups, buckets)
+            else:
+                counts[:, :, j] = cell_counts
+            sums[:, :, j] = np.bincount(cells, weights=centered, minlength=size).reshape(n_groups, buckets)
+            centered *= centered
+            squares[:, :, j] = np.bincount(cells, weights=centered, minlength=size).reshape(n_groups, buckets)
+        
+        n = counts.sum(axis=1)
+        total = sums.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = total / n
+            variances = (squares.sum(axis=1) - n * means ** 2) / (n - 1)
+            variances = np.maximum(variances, 0.0)
+            means = means + shifts
+            
+            # Welch's t-test of each arm against the control, for all metrics at once
+            difference = means - means[control_index]
+            standard_error = np.sqrt(variances / n + variances[control_index] / n[control_index])
+            t_statistic = difference / standard_error
+            dof = standard_error ** 4 / (
+                (variances / n) ** 2 / (n - 1)
+                + (variances[control_index] / n[control_index]) ** 2 / (n[control_index] - 1)
+            )
+            p_values = 2 * stats.t.sf(np.abs(t_statistic), dof)
+            relative_difference = difference / np.abs(means[control_index])
+        
+        arms = [i for i in range(n_groups) if i != control_index]
+        p_adjusted = np.full(p_values.shape, np.nan)
+        p_adjusted[arms] = adjust_p_values(p_values[arms].ravel(), correction).reshape(len(arms), n_metrics)
+        ci_low, ci_high = self._bootstrap_intervals(sums, counts, shifts, control_index, n_bootstrap, confidence, rng)
+        
+        def _float(value: float) -> Optional[float]:
+            return float(value) if np.isfinite(value) else None
+        
+        comparisons = []
+        for i in arms:
+            for j, metric in enumerate(metrics):
+                comparisons.append({
+                    "group": groups[i],
+                    "metric": metric,
+                    "control_mean": _float(means[control_index, j]),
+                    "group_mean": _float(means[i, j]),
+                    "difference": _float(difference[i, j]),
+                    "relative_difference": _float(relative_difference[i, j]),
+                    "t_statistic": _float(t_statistic[i, j]),
+                    "p_value": _float(p_values[i, j]),
+                    "p_value_adjusted": _float(p_adjusted[i, j]),
+                    "significant": bool(p_adjusted[i, j] < alpha),
+                    "ci_low": _float(ci_low[i, j]),
+                    "ci_high": _float(ci_high[i, j])
+                })
+        
+        return {
+            "group_column": group_column,
+            "control": groups[control_index],
+            "metrics": metrics,
+            "groups": [
+                {
+                    "group": groups[i],
+                    "size": int(group_sizes[i]),
+                    "means": {metric: _float(means[i, j]) for j, metric in enumerate(metrics)},
+                    "std": {metric: _float(np.sqrt(variances[i, j])) for j, metric in enumerate(metrics)}
+                }
+                for i in range(n_groups)
+            ],
+            "comparisons": comparisons,
+            "alpha": alpha,
+            "correction": correction,
+            "confidence": confidence,
+            "n_bootstrap": n_bootstrap
+        }
+    
+    def _bootstrap_intervals(
+        self,
+        sums: np.ndarray,
+        counts: np.ndarray,
+        shifts: np.ndarray,
+        control_index: int,
+        n_bootstrap: int,
+        confidence: float,
+        rng: np.random.Generator
+    ):
+        """Percentile intervals of (arm mean - control mean) from resampled buckets"""
+        n_groups, buckets, n_metrics = sums.shape
+        if n_bootstrap == 0:
+            # No replicates to take percentiles of; the intervals are reported as null
+            empty = np.full((n_groups, n_metrics), np.nan)
+            return empty, empty.copy()
+        replicates = np.empty((n_bootstrap, n_groups, n_metrics))
+        uniform = np.full(buckets, 1.0 / buckets)
+        for start in range(0, n_bootstrap, BOOTSTRAP_BATCH):
+            batch = min(BOOTSTRAP_BATCH, n_bootstrap - start)
+            # One multinomial weight vector per replicate and arm: (batch, groups, buckets)
+            weights = rng.multinomial(buckets, uniform, size=(batch, n_groups)).astype(np.float64)
+            replicate_sums = np.einsum("rgb,gbm->rgm", weights, sums)
+            replicate_counts = np.einsum("rgb,gbm->rgm", weights, counts)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                replicates[start:start + batch] = replicate_sums / replicate_counts + shifts
+        differences = replicates - replicates[:, control_index:control_index + 1, :]
+        tail = (1 - confidence) / 2 * 100
+        with warnings.catch_warnings():
+            # Metrics without values in an arm have no interval
+            warnings.simplefilter("ignore", RuntimeWarning)
+            low, high = np.nanpercentile(differences, [tail, 100 - tail], axis=0)
+        return low, high
+
+ab_testing_service = ABTestingService()
@@ -1,83 +1,309 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
 from scipy import stats
+import asyncio
+import json
+import threading
+from app.config import settings
+from app.services.data_service import data_service, PROFILE_ARTIFACT
+from app.services.sketches import HyperLogLog
+
+# z-score of a two-sided 95% interval
+Z_95 = 1.96
+# Targets with fewer distinct values than this are treated as classification
+MAX_CLASSES = 20
+# Bump whenever analyze_data_context changes so memoized results are recomputed
+ANALYSIS_VERSION = 4
+# Dataset artifact holding memoized analysis results
+ANALYSIS_ARTIFACT = "analysis.json"
+# Memoized results kept per dataset version (one per target column)
+ANALYSIS_MEMO_MAX_ENTRIES = 32
+
+
+def problem_approaches(unique_count: int) -> Tuple[str, List[str]]:
+    """Problem type and suitable approaches for a target with unique_count distinct values"""
+    if unique_count == 2:
+        return "Binary Classification", [
+            "Logistic Regression",
+            "Decision Trees",
+            "Random Forest",
+            "XGBoost",
+            "LightGBM"
+        ]
+    if 2 < unique_count < MAX_CLASSES:
+        return "Multi-class Classification", [
+            "Multi-class Classification",
+            "Decision Trees",
+            "Random Forest",
+            "XGBoost",
+            "LightGBM"
+        ]
+    return "Regression", [
+        "Linear Regression",
+        "Random Forest",
+        "XGBoost",
+        "LightGBM",
+        "CatBoost"
+    ]
+
+
+def recommended_visualizations(problem_type: Optional[str]) -> List[str]:
+    if problem_type == "Regression":
+        return [
+            "Scatter Plot",
+            "Residual Plot",
+            "Feature Importance",
+            "Correlation Heatmap"
+        ]
+    if problem_type in ["Binary Classification", "Multi-class Classification"]:
+        return [
+            "Confusion Matrix",
+            "ROC Curve",
+            "Feature Importance",
+            "Target Distribution"
+        ]
+    return []
+
+
+def sample_positions(total: int, rows: int, seed: int = 0) -> np.ndarray:
+    """Positions of a uniform sample of rows without replacement, in table order"""
+    if total <= rows:
+        return np.arange(total)
+    return np.sort(np.random.default_rng(seed).choice(total, size=rows, replace=False))
+
+
+def sample_rows(df: pd.DataFrame, rows: int, seed: int = 0) -> pd.DataFrame:
+    """Uniform sample of rows without replacement, kept in table order"""
+    if len(df) <= rows:
+        return df
+    return df.take(sample_positions(len(df), rows, seed))
+
 
 class AnalysisService:
-    async def analyze_data_context(self, df: pd.DataFrame, target_column: Optional[str] = None) -> Dict[str, Any]:
-        """Smart analysis to determine problem type and approach"""
+    def __init__(self):
+        self._memo_lock = threading.Lock()
+    
+    def _use_profile(self, name: str) -> bool:
+        """Analyze from the column profile if it is stored or cheap enough to build now"""
+        manifest = data_service.store.manifest(name)
+        return manifest["rows"] < settings.APPROX_PROFILE_MIN_ROWS or data_service.store.has_artifact(name, PROFILE_ARTIFACT)
+    
+    def _memo_key(self, name: str, target_column: Optional[str], use_profile: bool) -> str:
+        return json.dumps([
+            ANALYSIS_VERSION,
+            data_service.content_version(name),
+            target_column,
+            "profile" if use_profile else settings.APPROX_SAMPLE_ROWS
+        ])
+    
+    async def profile_dataset(self, filename: str, prefer_preprocessed: bool = False) -> Dict[str, Any]:
+        """Per-column statistics (histograms, quantiles, null rates, top values), built once and stored with the dataset"""
+        return await data_service.profile_dataset(filename, prefer_preprocessed)
+    
+    async def analyze_dataset(
+        self,
+        filename: str,
+        target_column: Optional[str] = None,
+        prefer_preprocessed: bool = False
+    ) -> Dict[str, Any]:
+        """Analysis of a stored dataset, memoized by content version, target and ANALYSIS_VERSION
+        
+        The analysis is derived from the dataset's column profile, which is built
+        in one chunked pass and stored with the dataset. Datasets of
+        APPROX_PROFILE_MIN_ROWS rows or more without a stored profile are
+        analyzed from a sample instead (see analyze_data_context).
+        
+        Results are kept as an artifact of the dataset, so they survive restarts
+        and are dropped together with the dataset version they describe; a hit
+        does not load the data at all.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._analyze_dataset_sync, filename, target_column, prefer_preprocessed)
+    
+    def _analyze_dataset_sync(self, filename: str, target_column: Optional[str], prefer_preprocessed: bool) -> Dict[str, Any]:
+        # Memo lookup, analysis and memo update all read or write files, so they run together in the executor
+        name = data_service.resolve_dataset(filename, prefer_preprocessed)
+        use_profile = self._use_profile(name)
+        key = self._memo_key(name, target_column, use_profile)
+        memo = data_service.store.read_artifact(name, ANALYSIS_ARTIFACT) or {}
+        if key in memo:
+            return memo[key]
+        
+        if use_profile:
+            result = self.analyze_profile(data_service.profile_dataset_sync(name), target_column)
+        else:
+            result = self._analyze_stored_sample(name, target_column)
+        with self._memo_lock:
+            memo = data_service.store.read_artifact(name, ANALYSIS_ARTIFACT) or {}
+            memo[key] = result
+            data_service.store.write_artifact(name, ANALYSIS_ARTIFACT, dict(list(memo.items())[-ANALYSIS_MEMO_MAX_ENTRIES:]))
+        return result
+    
+    def analyze_profile(self, profile: Dict[str, Any], target_column: Optional[str] = None) -> Dict[str, Any]:
+        """analyze_data_context computed from a column profile instead of the rows
+        
+        Counts are exact; the target's distinct count is exact unless it has
+        more distinct values than the frequent-items sketch tracks, in which case
+        it is a HyperLogLog estimate and the result is marked approximate.
+        """
+        columns = {column["name"]: column for column in profile["columns"]}
+        analysis_results = {
+            "problem_type": None,
+            "suitable_approaches": [],
+            "data_characteristics": {},
+            "recommended_visualizations": [],
+            "target_column": target_column,
+            "approximate": False
+        }
+        
+        if target_column and target_column in columns:
+            distinct = columns[target_column]["distinct"]
+            problem_type, approaches = problem_approaches(distinct["value"])
+            analysis_results["problem_type"] = problem_type
+            analysis_results["suitable_approaches"] = approaches
+            analysis_results["approximate"] = not distinct["exact"]
+        
+        if "group" in columns and "outcome" in columns:
+            analysis_results["suitable_approaches"].append("A/B Testing")
+        
+        analysis_results["data_characteristics"] = {
+            "numerical_columns": len(profile["numerical_columns"]),
+            "categorical_columns": len(profile["categorical_columns"]),
+            "missing_values": profile["missing_values"],
+            "total_rows": profile["rows"],
+            "total_columns": len(columns)
+        }
+        analysis_results["recommended_visualizations"] = recommended_visualizations(analysis_results["problem_type"])
+        analysis_results["column_profiles"] = profile["columns"]
+        return analysis_results
+    
+    def _analyze_stored_sample(self, name: str, target_column: Optional[str]) -> Dict[str, Any]:
+        """Approximate analyze_data_context of a stored dataset, without loading it
+        
+        Only the sampled rows are copied out of the memory-mapped parts, and only
+        the target column is read in full for its HyperLogLog.
+        """
+        table = data_service.store.read_table(name)
+        sample = table.take(sample_positions(table.num_rows, settings.APPROX_SAMPLE_ROWS)).to_pandas()
+        
+        def target_chunks() -> Iterable[pd.Series]:
+            for batch in table.select([target_column]).to_batches(max_chunksize=settings.CHUNK_ROWS):
+                yield batch.column(0).to_pandas()
+        
+        return self._analyze(sample, table.num_rows, table.column_names, target_column, True, target_chunks)
+    
+    def _approximation(
+        self,
+        total: int,
+        columns: List[str],
+        sample: pd.DataFrame,
+        row_missing: np.ndarray,
+        target_column: Optional[str],
+        cardinality: Optional[HyperLogLog]
+    ) -> Dict[str, Any]:
+        """Error bounds for an analysis computed from a sample"""
+        n = len(sample)
+        # Standard error of a total estimated from a simple random sample (with finite population correction)
+        se = total * row_missing.std(ddof=1) / np.sqrt(n) * np.sqrt(1 - n / total) if n > 1 else 0.0
+        estimate = total * row_missing.mean()
+        bounds = {
+            "sample_rows": n,
+            "missing_values_ci95": [max(0, int(estimate - Z_95 * se)), int(np.ceil(estimate + Z_95 * se))]
+        }
+        if target_column and target_column in columns:
+            counts = sample[target_column].value_counts(dropna=True)
+            counts = counts[counts > 0]
+            bounds.update({
+                "target_sample_distinct": len(counts),
+                # Good-Turing: share of rows whose target value never appeared in the sample
+                "target_unseen_fraction": float((counts == 1).sum() / max(int(counts.sum()), 1)),
+                # Any target value at least this frequent is in the sample with 95% probability
+                "target_min_detected_frequency": float(-np.log(0.05) / n)
+            })
+            if cardinality is not None:
+                bounds["target_cardinality"] = round(cardinality.estimate())
+                bounds["target_cardinality_relative_error"] = cardinality.relative_error
+        return bounds
+    
+    async def analyze_data_context(
+        self,
+        df: pd.DataFrame,
+        target_column: Optional[str] = None,
+        approximate: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Smart analysis to determine problem type and approach
+        
+        At APPROX_PROFILE_MIN_ROWS rows or more (or approximate=True) the problem
+        type and missing values are inferred from a uniform sample and the target
+        cardinality from a HyperLogLog sketch; "approximation" holds the error bounds.
+        """
+        if approximate is None:
+            approximate = len(df) >= settings.APPROX_PROFILE_MIN_ROWS
+        sample = sample_rows(df, settings.APPROX_SAMPLE_ROWS) if approximate else df
+        return self._analyze(sample, len(df), list(df.columns), target_column, approximate, lambda: [df[target_column]])
+    
+    def _analyze(
+        self,
+        sample: pd.DataFrame,
+        total: int,
+        columns: List[str],
+        target_column: Optional[str],
+        approximate: bool,
+        target_chunks: Callable[[], Iterable[pd.Series]]
+    ) -> Dict[str, Any]:
+        """analyze_data_context of a dataset of `total` rows from its sample (the whole frame unless approximate)"""
         analysis_results = {
             "problem_type": None,
             "suitable_approaches": [],
             "data_characteristics": {},
             "recommended_visualizations": [],
-            "target_column": target_column
+            "target_column": target_column,
+            "approximate": approximate
         }
         
         # Analyze target variable if provided
-        if target_column and target_column in df.columns:
-            target = df[target_column]
+        cardinality = None
+        if target_column and target_column in columns:
+            target = sample[target_column]
             unique_count = target.nunique()
+            if approximate and unique_count < MAX_CLASSES:
+                # Only a classification verdict can be overturned by values the sample missed
+                cardinality = HyperLogLog()
+                for chunk in target_chunks():
+                    cardinality.update(chunk)
+                unique_count = max(unique_count, round(cardinality.estimate()))
             
-            if unique_count == 2:
-                analysis_results["problem_type"] = "Binary Classification"
-                analysis_results["suitable_approaches"] = [
-                    "Logistic Regression",
-                    "Decision Trees",
-                    "Random Forest",
-                    "XGBoost",
-                    "LightGBM"
-                ]
-            elif 2 < unique_count < 20:
-                analysis_results["problem_type"] = "Multi-class Classification"
-                analysis_results["suitable_approaches"] = [
-                    "Multi-class Classification",
-                    "Decision Trees",
-                    "Random Forest",
-                    "XGBoost",
-                    "LightGBM"
-                ]
-            else:
-                analysis_results["problem_type"] = "Regression"
-                analysis_results["suitable_approaches"] = [
-                    "Linear Regression",
-                    "Random Forest",
-                    "XGBoost",
-                    "LightGBM",
-                    "CatBoost"
-                ]
+            problem_type, approaches = problem_approaches(unique_count)
+            analysis_results["problem_type"] = problem_type
+            analysis_results["suitable_approaches"] = approaches
         
         # Check for A/B test potential
-        if "group" in df.columns and "outcome" in df.columns:
+        if "group" in columns and "outcome" in columns:
             analysis_results["suitable_approaches"].append("A/B Testing")
         
         # Data characteristics
-        numerical_cols = df.select_dtypes(include=[np.number]).columns
-        categorical_cols = df.select_dtypes(include=['object']).columns
+        numerical_cols = sample.select_dtypes(include=[np.number]).columns
+        categorical_cols = sample.select_dtypes(include=['object', 'category']).columns
+        
+        if approximate:
+            row_missing = sample.isnull().sum(axis=1).to_numpy()
+            missing_values = int(round(row_missing.sum() * total / len(sample)))
+        else:
+            missing_values = int(sample.isnull().sum().sum())
         
         analysis_results["data_characteristics"] = {
             "numerical_columns": len(numerical_cols),
             "categorical_columns": len(categorical_cols),
-            "missing_values": int(df.isnull().sum().sum()),
-            "total_rows": len(df),
-            "total_columns": len(df.columns)
+            "missing_values": missing_values,
+            "total_rows": total,
+            "total_columns": len(columns)
         }
+        if approximate:
+            analysis_results["approximation"] = self._approximation(total, columns, sample, row_missing, target_column, cardinality)
         
         # Recommended visualizations
-        if analysis_results["problem_type"] == "Regression":
-            analysis_results["recommended_visualizations"] = [
-                "Scatter Plot",
-                "Residual Plot",
-                "Feature Importance",
-                "Correlation Heatmap"
-            ]
-        elif analysis_results["problem_type"] in ["Binary Classification", "Multi-class Classification"]:
-            analysis_results["recommended_visualizations"] = [
-                "Confusion Matrix",
-                "ROC Curve",
-                "Feature Importance",
-                "Target Distribution"
-            ]
+        analysis_results["recommended_visualizations"] = recommended_visualizations(analysis_results["problem_type"])
         
         return analysis_results
     
@@ -1,77 +1,688 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Iterator, List, Tuple, BinaryIO
+import asyncio
+import hashlib
+import io
+import logging
 import os
+import shutil
+import tempfile
+import zlib
 from app.config import settings
+from app.services.dataset_store import dataset_store
+from app.services.dataset_cache import dataset_cache
+from app.services.preprocessing_service import preprocessing_service, ImputationPipeline
+from app.services.profile_service import profile_service, DatasetProfile, PROFILE_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Bytes of the upload kept in memory to infer the schema
+SCHEMA_SAMPLE_BYTES = 1048576  # 1MB
+# Largest piece of decompressed content produced at once, so the size limit is checked before a bomb expands
+DECOMPRESS_PIECE_BYTES = 1048576  # 1MB
+# Compressed bytes fed to zstd at once: its decompressobj has no output bound, and one
+# byte of RLE input can expand to ~128KB, so this caps a piece at about 32MB
+ZSTD_INPUT_BYTES = 256
+# Upload extensions and the codec their content is compressed with
+UPLOAD_COMPRESSION = {".csv": None, ".csv.gz": "gzip", ".csv.zst": "zstd"}
+# Directory suffix for the raw shards of a multi-part dataset
+SHARDS_SUFFIX = "_shards"
+# Artifact of a preprocessed dataset holding its fitted imputation pipeline
+IMPUTER_ARTIFACT = "imputer.json"
+# Artifact holding a dataset's column profile and the sketches it was built from
+PROFILE_ARTIFACT = "profile.json"
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds settings.MAX_FILE_SIZE"""
+
+
+def upload_compression(filename: str) -> Optional[str]:
+    """Codec of a supported upload, raising ValueError for anything else"""
+    for ext in sorted(UPLOAD_COMPRESSION, key=len, reverse=True):
+        if filename.endswith(ext):
+            return UPLOAD_COMPRESSION[ext]
+    raise ValueError(f"Unsupported file type: {filename}. Supported: {', '.join(UPLOAD_COMPRESSION)}")
+
+
+class _StreamDecompressor:
+    """Incremental decompression of (possibly concatenated) gzip or zstd frames"""
+    
+    def __init__(self, codec: str):
+        self.codec = codec
+        self._obj = self._new()
+    
+    def _new(self):
+        if self.codec == "gzip":
+            return zlib.decompressobj(zlib.MAX_WBITS | 16)
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd uploads require the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompressobj()
+    
+    def decompress(self, chunk: bytes) -> Iterator[bytes]:
+        """The decompressed content of chunk, in bounded pieces"""
+        while chunk:
+            if self.codec == "gzip":
+                piece = self._obj.decompress(chunk, DECOMPRESS_PIECE_BYTES)
+                # At the end of a member the rest of the input is in unused_data instead
+                chunk = b"" if self._obj.eof else self._obj.unconsumed_tail
+                yield piece
+                # A full piece may leave output buffered in zlib after the input is used up
+                while len(piece) == DECOMPRESS_PIECE_BYTES and not chunk and not self._obj.eof:
+                    piece = self._obj.decompress(b"", DECOMPRESS_PIECE_BYTES)
+                    yield piece
+            else:
+                yield self._obj.decompress(chunk[:ZSTD_INPUT_BYTES])
+                chunk = chunk[ZSTD_INPUT_BYTES:]
+            if self._obj.eof:
+                # Start on the next frame/member, if any
+                chunk = self._obj.unused_data + chunk
+                self._obj = self._new()
+
+
+class _StreamProfiler:
+    """Buffers the head of a CSV and fingerprints its content while the bytes arrive"""
+    
+    def __init__(self, sample_bytes: int = SCHEMA_SAMPLE_BYTES):
+        self.sample_bytes = sample_bytes
+        self.sample = bytearray()
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+    
+    def update(self, chunk: bytes):
+        self.size += len(chunk)
+        self.sha256.update(chunk)
+        if len(self.sample) < self.sample_bytes:
+            self.sample.extend(chunk[:self.sample_bytes - len(self.sample)])
+    
+    @property
+    def fingerprint(self) -> str:
+        return self.sha256.hexdigest()
+    
+    def sample_frame(self) -> pd.DataFrame:
+        """Parse the buffered head of the file, cut at the last complete line"""
+        sample = bytes(self.sample)
+        if self.size > len(sample):
+            sample = sample[:sample.rfind(b"\n") + 1]
+        return pd.read_csv(io.BytesIO(sample))
+
+
+def _read_csv_c(path: Path) -> pd.DataFrame:
+    """pandas' default single-threaded C parser"""
+    return pd.read_csv(path)
+
+
+def _pyarrow_options() -> Dict[str, Any]:
+    if settings.CSV_THREADS > 0 and pa.cpu_count() != settings.CSV_THREADS:
+        pa.set_cpu_count(settings.CSV_THREADS)
+    return {
+        "read_options": pa_csv.ReadOptions(use_threads=True, block_size=settings.CSV_BLOCK_SIZE),
+        # Empty strings are missing values, as with pandas
+        "convert_options": pa_csv.ConvertOptions(strings_can_be_null=True)
+    }
+
+
+def _arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    # pandas leaves dates as strings; do the same so downstream dtypes don't depend on the engine
+    for i, field in enumerate(table.schema):
+        if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return table.to_pandas()
+
+
+def _read_csv_pyarrow(path: Path) -> pd.DataFrame:
+    """pyarrow's CSV reader, which splits the file into blocks and parses them on all threads"""
+    return _arrow_to_pandas(pa_csv.read_csv(path, **_pyarrow_options()))
+
+
+def _iter_csv_c(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    return pd.read_csv(path, chunksize=chunk_rows)
+
+
+def _iter_csv_pyarrow(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """pyarrow's streaming CSV reader: blocks are parsed on all threads and grouped into chunk_rows frames
+    
+    Column types are inferred from the first block; a later value that does not
+    fit them raises pa.ArrowInvalid.
+    """
+    batches, rows = [], 0
+    for batch in pa_csv.open_csv(path, **_pyarrow_options()):
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunk_rows:
+            yield _arrow_to_pandas(pa.Table.from_batches(batches))
+            batches, rows = [], 0
+    if batches:
+        yield _arrow_to_pandas(pa.Table.from_batches(batches))
+
+
+CSV_READERS: Dict[str, Callable[[Path], pd.DataFrame]] = {
+    "c": _read_csv_c,
+    "pyarrow": _read_csv_pyarrow,
+}
+# Readers of large CSVs in frames of about a given number of rows, by CSV_ENGINE
+CSV_CHUNK_READERS: Dict[str, Callable[[Path, int], Iterator[pd.DataFrame]]] = {
+    "c": _iter_csv_c,
+    "pyarrow": _iter_csv_pyarrow,
+}
+
+
+def compact_dtypes(df: pd.DataFrame, category_max_unique_ratio: float = 0.5) -> pd.DataFrame:
+    """Downcast numeric columns and convert low-cardinality strings to category
+    
+    Integers take the smallest type that holds their range; floats become float32
+    only when no value changes. The Arrow store keeps these types, so later loads
+    get the compact frame without redoing this pass.
+    """
+    compacted = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            compacted[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            downcast = series.astype(np.float32)
+            if np.array_equal(downcast.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+                compacted[col] = downcast
+        elif series.dtype == object and len(series) > 0:
+            if series.nunique(dropna=True) / len(series) <= category_max_unique_ratio:
+                compacted[col] = series.astype("category")
+    if not compacted:
+        return df
+    return df.assign(**compacted)
+
 
 class DataService:
     def __init__(self):
         self.data_path = Path(settings.DATA_STORAGE_PATH)
         self.data_path.mkdir(parents=True, exist_ok=True)
+        self.store = dataset_store
+        self.cache = dataset_cache
+        if settings.CSV_ENGINE not in CSV_READERS:
+            raise ValueError(f"Unknown CSV_ENGINE '{settings.CSV_ENGINE}'. Available: {list(CSV_READERS)}")
+        self.read_csv = CSV_READERS[settings.CSV_ENGINE]
+        self.iter_csv = CSV_CHUNK_READERS[settings.CSV_ENGINE]
     
-    async def ingest_data(self, file_content: bytes, filename: str) -> Dict[str, Any]:
-        """Automated data ingestion"""
-        try:
-            # Save uploaded file
-            file_path = self.data_path / filename
-            with open(file_path, "wb") as f:
-                f.write(file_content)
-            
-            # Load and validate
-            df = pd.read_csv(file_path)
-            
+    def _receive_chunk(
+        self,
+        f: BinaryIO,
+        chunk: bytes,
+        profiler: _StreamProfiler,
+        decompressor: Optional[_StreamDecompressor],
+        limit: int
+    ):
+        """Write a chunk as received and profile its decompressed content, piece by piece against the limit"""
+        for data in (decompressor.decompress(chunk) if decompressor else [chunk]):
+            if profiler.size + len(data) > limit:
+                raise FileTooLargeError(
+                    f"File exceeds the maximum upload size of {settings.MAX_FILE_SIZE} bytes"
+                )
+            profiler.update(data)
+        f.write(chunk)
+    
+    async def _receive(
+        self,
+        chunks: AsyncIterator[bytes],
+        dest: Path,
+        compression: Optional[str],
+        limit: int
+    ) -> _StreamProfiler:
+        """Stream an upload to dest, decompressing on the fly for profiling and the size limit"""
+        loop = asyncio.get_event_loop()
+        profiler = _StreamProfiler()
+        decompressor = _StreamDecompressor(compression) if compression else None
+        with open(dest, "wb") as f:
+            async for chunk in chunks:
+                # Decompression and disk writes go to the executor so the event loop keeps serving other requests
+                await loop.run_in_executor(
+                    None, self._receive_chunk, f, chunk, profiler, decompressor, limit
+                )
+        return profiler
+    
+    def _summary(self, name: str, in_memory: bool = True) -> Dict[str, Any]:
+        """Shape and dtypes of a stored dataset; large datasets are summarized from their schema only"""
+        if in_memory:
+            df = self.load_dataset_sync(name)
             return {
-                "filename": filename,
                 "rows": len(df),
                 "columns": len(df.columns),
                 "column_names": df.columns.tolist(),
                 "dtypes": df.dtypes.astype(str).to_dict(),
-                "memory_usage": df.memory_usage(deep=True).sum(),
-                "file_path": str(file_path)
+                "memory_usage": int(df.memory_usage(deep=True).sum())
             }
+        table = self.store.read_table(name)
+        empty = table.schema.empty_table().to_pandas()
+        return {
+            "rows": table.num_rows,
+            "columns": table.num_columns,
+            "column_names": table.column_names,
+            "dtypes": empty.dtypes.astype(str).to_dict(),
+            "memory_usage": int(table.nbytes)
+        }
+    
+    def _temp_path(self, prefix: str) -> Path:
+        """A new empty file in the data directory, unique so that concurrent uploads never share one"""
+        fd, path = tempfile.mkstemp(prefix=f".{prefix}.", suffix=".part", dir=self.data_path)
+        os.close(fd)
+        return Path(path)
+    
+    def _report(self, filename: str, summary: Dict[str, Any], file_path: Path, fingerprint: str) -> Dict[str, Any]:
+        return {
+            "filename": filename,
+            **summary,
+            "file_path": str(file_path),
+            "fingerprint": fingerprint
+        }
+    
+    def _link_known(self, known: Dict[str, Any], name: str, filename: str, file_path: Path) -> Dict[str, Any]:
+        """Store content that another dataset already holds under `name` as well, sharing its parts and artifacts"""
+        self.store.link(known["dataset"], name)
+        # New content under this name: artifacts derived from the old content are stale
+        self.store.delete(self.store.preprocessed_name(name))
+        report = {**known["report"], "filename": filename, "file_path": str(file_path)}
+        self.store.record_fingerprint(report["fingerprint"], name, report)
+        return {**report, "deduplicated": True, "linked_from": known["dataset"]}
+    
+    async def ingest_stream(self, chunks: AsyncIterator[bytes], filename: str) -> Dict[str, Any]:
+        """Stream an upload to disk in chunks, profiling it as the bytes arrive
+        
+        .csv.gz and .csv.zst uploads are kept compressed on disk and decompressed
+        while streaming, so the size limit and fingerprint apply to the CSV itself.
+        Content that was ingested before (same sha256) is not parsed again: a
+        re-upload under the same name returns the stored report, and under
+        another name the existing dataset's parts are shared (see _link_known).
+        """
+        compression = upload_compression(filename)
+        file_path = self.data_path / filename
+        name = self.store.dataset_name(filename)
+        tmp_path = self._temp_path(filename)
+        loop = asyncio.get_event_loop()
+        try:
+            profiler = await self._receive(chunks, tmp_path, compression, settings.MAX_FILE_SIZE)
+            # Fail fast on content that is not a CSV
+            profiler.sample_frame()
+            
+            fingerprint = profiler.fingerprint
+            known = self.store.lookup_fingerprint(fingerprint)
+            if known is not None and known["dataset"] == name:
+                return {**known["report"], "deduplicated": True}
+            
+            os.replace(tmp_path, file_path)
+            if known is not None:
+                return await loop.run_in_executor(None, self._link_known, known, name, filename, file_path)
+            
+            # Parse once into the columnar store; every later load reads the Arrow copy
+            summary = await loop.run_in_executor(
+                None, self._import_csv, file_path, name, fingerprint, profiler.size
+            )
+            # New content under this name: artifacts derived from the old content are stale
+            self.store.delete(self.store.preprocessed_name(name))
+            
+            report = self._report(filename, summary, file_path, fingerprint)
+            self.store.record_fingerprint(fingerprint, name, report)
+            return report
+        except FileTooLargeError:
+            raise
         except Exception as e:
             raise ValueError(f"Data ingestion failed: {str(e)}")
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
     
-    async def preprocess_data(self, file_path: str) -> Dict[str, Any]:
-        """Automated preprocessing"""
-        df = pd.read_csv(file_path)
-        
-        preprocessing_report = {
-            "original_shape": df.shape,
-            "missing_values": df.isnull().sum().to_dict(),
-            "duplicate_rows": df.duplicated().sum(),
-            "numerical_columns": df.select_dtypes(include=[np.number]).columns.tolist(),
-            "categorical_columns": df.select_dtypes(include=['object']).columns.tolist(),
-            "preprocessing_applied": []
-        }
+    async def ingest_parts(self, name: str, parts: AsyncIterator[Tuple[str, AsyncIterator[bytes]]]) -> Dict[str, Any]:
+        """Ingest several CSV shards (optionally compressed) as one logical dataset
         
-        # Handle missing values
-        if df.isnull().sum().sum() > 0:
-            # Numerical: fill with median
-            for col in preprocessing_report["numerical_columns"]:
-                if df[col].isnull().sum() > 0:
-                    df[col].fillna(df[col].median(), inplace=True)
-                    preprocessing_report["preprocessing_applied"].append(f"Filled missing values in {col} with median")
+        Each shard is streamed, parsed and stored as its own Arrow part; loads
+        memory-map the parts as a single table, so the shards are never
+        concatenated into one CSV. MAX_FILE_SIZE applies to the whole dataset.
+        """
+        name = self.store.dataset_name(name)
+        shards_dir = self.data_path / f"{name}{SHARDS_SUFFIX}"
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f".{name}{SHARDS_SUFFIX}.", suffix=".part", dir=self.data_path))
+        loop = asyncio.get_event_loop()
+        try:
+            shard_files = []
+            shard_sizes = []
+            digests = []
+            total_size = 0
+            columns = None
+            async for filename, chunks in parts:
+                compression = upload_compression(filename)
+                shard_name = f"{len(shard_files):05d}-{Path(filename).name}"
+                profiler = await self._receive(
+                    chunks, tmp_dir / shard_name, compression, settings.MAX_FILE_SIZE - total_size
+                )
+                shard_columns = profiler.sample_frame().columns.tolist()
+                if columns is not None and shard_columns != columns:
+                    raise ValueError(f"Shard {filename} has columns {shard_columns}, expected {columns}")
+                columns = shard_columns
+                total_size += profiler.size
+                digests.append(profiler.fingerprint)
+                shard_files.append(shard_name)
+                shard_sizes.append(profiler.size)
+            if not shard_files:
+                raise ValueError("No files were uploaded")
+            
+            fingerprint = hashlib.sha256("".join(digests).encode()).hexdigest()
+            known = self.store.lookup_fingerprint(fingerprint)
+            if known is not None and known["dataset"] == name:
+                return {**known["report"], "deduplicated": True}
             
-            # Categorical: fill with mode
-            for col in preprocessing_report["categorical_columns"]:
-                if df[col].isnull().sum() > 0:
-                    df[col].fillna(df[col].mode()[0] if len(df[col].mode()) > 0 else "Unknown", inplace=True)
-                    preprocessing_report["preprocessing_applied"].append(f"Filled missing values in {col} with mode")
+            if shards_dir.exists():
+                shutil.rmtree(shards_dir)
+            os.replace(tmp_dir, shards_dir)
+            if known is not None:
+                return await loop.run_in_executor(None, self._link_known, known, name, name, shards_dir)
+            
+            summary = await loop.run_in_executor(
+                None, self._import_parts, [shards_dir / shard for shard in shard_files], shard_sizes, name, fingerprint
+            )
+            self.store.delete(self.store.preprocessed_name(name))
+            
+            report = self._report(name, summary, shards_dir, fingerprint)
+            self.store.record_fingerprint(fingerprint, name, report)
+            return report
+        except FileTooLargeError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Data ingestion failed: {str(e)}")
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir)
+    
+    async def append_stream(self, name: str, chunks: AsyncIterator[bytes], filename: str) -> Dict[str, Any]:
+        """Append the rows of an uploaded CSV (optionally compressed) to an existing dataset
+        
+        Only the new rows are parsed; they become new Arrow parts next to the
+        existing ones. A preprocessed version of the dataset is extended as well,
+        using the persisted imputation pipeline, which is updated from the new
+        rows instead of re-scanning the dataset.
+        """
+        compression = upload_compression(filename)
+        loop = asyncio.get_event_loop()
+        name = await loop.run_in_executor(None, self.resolve_dataset, name)
+        tmp_path = self._temp_path(f"{name}.append")
+        try:
+            profiler = await self._receive(chunks, tmp_path, compression, settings.MAX_FILE_SIZE)
+            columns = profiler.sample_frame().columns.tolist()
+            expected = self.store.manifest(name)["column_names"]
+            if columns != expected:
+                raise ValueError(f"Appended file has columns {columns}, expected {expected}")
+            
+            summary = await loop.run_in_executor(
+                None, self._append_sync, name, tmp_path, profiler.size, profiler.fingerprint
+            )
+            report = self._report(filename, summary, self.store.dataset_dir(name), self.store.manifest(name)["fingerprint"])
+            self.store.record_fingerprint(report["fingerprint"], name, report)
+            return report
+        except FileTooLargeError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Data append failed: {str(e)}")
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    
+    def _append_sync(self, name: str, csv_path: Path, size: int, fingerprint: str) -> Dict[str, Any]:
+        manifest = self.store.manifest(name)
+        first_part = len(manifest["parts"])
+        profile = self._stored_profile(name)
+        staging_dir = self.store.stage(name)
+        self._write_csv_parts(csv_path, size, staging_dir, first_part)
+        # The dataset's content is now the old content plus the appended rows
+        combined = hashlib.sha256(f"{manifest['fingerprint'] or ''}{fingerprint}".encode()).hexdigest()
+        self.store.append(name, staging_dir, fingerprint=combined)
+        if profile is not None:
+            self._save_profile(name, profile_service.profile(
+                self.store.iter_frames(name, settings.CHUNK_ROWS, first_part), profile
+            ))
+        
+        summary = self._summary(name, in_memory=not self._is_large(self.store.size_bytes(name)))
+        summary["appended_rows"] = self.store.manifest(name)["rows"] - manifest["rows"]
+        summary["preprocessing"] = self._append_preprocessed(name, first_part)
+        return summary
+    
+    def _append_preprocessed(self, name: str, first_part: int) -> Optional[Dict[str, Any]]:
+        """Impute and append the new rows (parts from first_part on) to the preprocessed dataset
+        
+        Duplicates are dropped among the appended rows only, not against rows
+        that were preprocessed before.
+        """
+        preprocessed_name = self.store.preprocessed_name(name)
+        state = self.store.read_artifact(preprocessed_name, IMPUTER_ARTIFACT) if self.store.exists(preprocessed_name) else None
+        if state is None:
+            return None
+        pipeline = ImputationPipeline.from_dict(state["pipeline"])
+        
+        profile = self._stored_profile(preprocessed_name)
+        staging_dir = self.store.stage(preprocessed_name)
+        first_preprocessed_part = len(self.store.manifest(preprocessed_name)["parts"])
+        
+        def write_chunk(index: int, chunk: pd.DataFrame):
+            self.store.write_part(
+                staging_dir, first_preprocessed_part + index, pa.Table.from_pandas(chunk, preserve_index=False)
+            )
+        
+        with tempfile.TemporaryDirectory(dir=self.data_path, prefix=f".{name}.spill") as spill_dir:
+            append_report, pipeline = preprocessing_service.preprocess_chunked(
+                lambda: self.store.iter_frames(name, settings.CHUNK_ROWS, first_part),
+                self.store.empty_frame(name),
+                write_chunk,
+                Path(spill_dir),
+                pipeline=pipeline
+            )
+        self.store.append(preprocessed_name, staging_dir)
+        if profile is not None:
+            self._save_profile(preprocessed_name, profile_service.profile(
+                self.store.iter_frames(preprocessed_name, settings.CHUNK_ROWS, first_preprocessed_part), profile
+            ))
+        
+        report = state["report"]
+        report["original_shape"] = [report["original_shape"][0] + append_report["original_shape"][0], report["original_shape"][1]]
+        report["preprocessed_shape"] = [report["preprocessed_shape"][0] + append_report["preprocessed_shape"][0], report["preprocessed_shape"][1]]
+        report["missing_values"] = {
+            col: report["missing_values"].get(col, 0) + int(count) for col, count in append_report["missing_values"].items()
+        }
+        report["duplicate_rows"] += append_report["duplicate_rows"]
+        for message in append_report["preprocessing_applied"]:
+            if message not in report["preprocessing_applied"]:
+                report["preprocessing_applied"].append(message)
+        self._save_imputer(name, pipeline, report, state["chunked"])
+        return append_report
+    
+    def _parse_csv(self, csv_path: Path) -> pd.DataFrame:
+        df = self.read_csv(csv_path)
+        if settings.COMPACT_DTYPES:
+            df = compact_dtypes(df, settings.CATEGORY_MAX_UNIQUE_RATIO)
+        return df
+    
+    def _is_large(self, size: int) -> bool:
+        """Whether data of this many (uncompressed) bytes is processed in chunks rather than in memory"""
+        return size >= settings.CHUNKED_PROCESSING_MIN_BYTES
+    
+    def _write_csv_parts(self, csv_path: Path, size: int, staging_dir: Path, start: int) -> int:
+        """Write a CSV as one Arrow part, or as one part per CHUNK_ROWS rows when it is large"""
+        if not self._is_large(size):
+            df = self._parse_csv(csv_path)
+            self.store.write_part(staging_dir, start, pa.Table.from_pandas(df, preserve_index=False))
+            return start + 1
         
-        # Remove duplicates
-        if preprocessing_report["duplicate_rows"] > 0:
-            df.drop_duplicates(inplace=True)
-            preprocessing_report["preprocessing_applied"].append("Removed duplicate rows")
+        # Chunks are parsed and compacted independently; commit() unifies their schemas
+        try:
+            return self._write_csv_chunks(self.iter_csv, csv_path, staging_dir, start)
+        except pa.ArrowInvalid as e:
+            # pyarrow fixes column types from the first block; pandas infers them per chunk
+            logger.warning(f"Re-reading {csv_path.name} with the pandas parser: {e}")
+            return self._write_csv_chunks(_iter_csv_c, csv_path, staging_dir, start)
+    
+    def _write_csv_chunks(self, iter_csv, csv_path: Path, staging_dir: Path, start: int) -> int:
+        index = start
+        for chunk in iter_csv(csv_path, settings.CHUNK_ROWS):
+            if settings.COMPACT_DTYPES:
+                chunk = compact_dtypes(chunk, settings.CATEGORY_MAX_UNIQUE_RATIO)
+            self.store.write_part(staging_dir, index, pa.Table.from_pandas(chunk, preserve_index=False))
+            index += 1
+        # A retry may write fewer parts than the attempt it replaces
+        for stale in staging_dir.glob("part-*.arrow"):
+            if index <= int(stale.stem.split("-")[1]):
+                stale.unlink()
+        return index
+    
+    def _import_parts(self, shard_paths: List[Path], sizes: List[int], name: str, fingerprint: str) -> Dict[str, Any]:
+        """Parse each shard into Arrow parts of one dataset and summarize it"""
+        staging_dir = self.store.stage(name)
+        index = 0
+        for shard_path, size in zip(shard_paths, sizes):
+            index = self._write_csv_parts(shard_path, size, staging_dir, index)
+        self.store.commit(name, staging_dir, source=shard_paths[0].parent.name, fingerprint=fingerprint)
+        return self._summary(name, in_memory=not self._is_large(sum(sizes)))
+    
+    def _import_csv(
+        self,
+        csv_path: Path,
+        name: str,
+        fingerprint: Optional[str] = None,
+        size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Parse a raw CSV into the columnar store and summarize it"""
+        size = size if size is not None else csv_path.stat().st_size
+        staging_dir = self.store.stage(name)
+        self._write_csv_parts(csv_path, size, staging_dir, 0)
+        self.store.commit(name, staging_dir, source=csv_path.name, fingerprint=fingerprint)
+        return self._summary(name, in_memory=not self._is_large(size))
+    
+    def resolve_dataset(self, filename: str, prefer_preprocessed: bool = False) -> str:
+        """Resolve a filename to a dataset in the store, importing legacy CSV uploads on first use"""
+        name = self.store.dataset_name(filename)
+        candidates = [self.store.preprocessed_name(name), name] if prefer_preprocessed else [name]
+        for candidate in candidates:
+            if self.store.exists(candidate):
+                return candidate
+        for candidate in candidates:
+            csv_path = self.store.legacy_csv(candidate)
+            if csv_path is not None:
+                self._import_csv(csv_path, candidate)
+                return candidate
+        raise FileNotFoundError(f"Dataset '{filename}' not found in {self.data_path}")
+    
+    def load_dataset_sync(self, filename: str, prefer_preprocessed: bool = False) -> pd.DataFrame:
+        """Load a dataset from the shared cache or the columnar store (read-only)"""
+        name = self.resolve_dataset(filename, prefer_preprocessed)
+        return self.cache.get_or_load(self.store.manifest_path(name), lambda: self.store.load(name))
+    
+    async def load_dataset(self, filename: str, prefer_preprocessed: bool = False) -> pd.DataFrame:
+        """Load a dataset, optionally preferring its preprocessed version"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.load_dataset_sync, filename, prefer_preprocessed)
+    
+    def content_version(self, name: str) -> str:
+        """Identifies the content of a dataset: its fingerprint, or its commit time when it has none"""
+        return self.store.version(self.store.manifest(name))
+    
+    def append_lineage(self, name: str) -> Dict[str, int]:
+        """Earlier content versions the dataset's current rows extend by appends only, with their row counts"""
+        return {entry["version"]: entry["rows"] for entry in self.store.manifest(name).get("lineage", [])}
+    
+    def _stored_profile(self, name: str) -> Optional[DatasetProfile]:
+        """The dataset's stored profile, if it is current"""
+        state = self.store.read_artifact(name, PROFILE_ARTIFACT)
+        if state is None or state["version"] != PROFILE_VERSION or state["content_version"] != self.content_version(name):
+            return None
+        return DatasetProfile.from_dict(state["profile"])
+    
+    def _save_profile(self, name: str, profile: DatasetProfile) -> Dict[str, Any]:
+        summary = profile.summary()
+        self.store.write_artifact(name, PROFILE_ARTIFACT, {
+            "version": PROFILE_VERSION,
+            "content_version": self.content_version(name),
+            "summary": summary,
+            "profile": profile.to_dict()
+        })
+        return summary
+    
+    def profile_dataset_sync(self, filename: str, prefer_preprocessed: bool = False, build: bool = True) -> Optional[Dict[str, Any]]:
+        """Column profile summary of a dataset, built in one chunked pass on first use and stored with it
+        
+        With build=False only an existing, current profile is returned (or None).
+        """
+        name = self.resolve_dataset(filename, prefer_preprocessed)
+        state = self.store.read_artifact(name, PROFILE_ARTIFACT)
+        if state and state["version"] == PROFILE_VERSION and state["content_version"] == self.content_version(name):
+            return state["summary"]
+        if not build:
+            return None
+        profile = profile_service.profile(
+            self.store.iter_frames(name, settings.CHUNK_ROWS), DatasetProfile.for_frame(self.store.empty_frame(name))
+        )
+        return self._save_profile(name, profile)
+    
+    async def profile_dataset(self, filename: str, prefer_preprocessed: bool = False, build: bool = True) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.profile_dataset_sync, filename, prefer_preprocessed, build)
+    
+    def _save_imputer(self, name: str, pipeline: ImputationPipeline, report: Dict[str, Any], chunked: bool):
+        self.store.write_artifact(self.store.preprocessed_name(name), IMPUTER_ARTIFACT, {
+            "source_version": self.content_version(name),
+            "chunked": chunked,
+            "report": report,
+            "pipeline": pipeline.to_dict()
+        })
+    
+    def load_imputer(self, filename: str) -> Optional[ImputationPipeline]:
+        """Imputation pipeline fitted when the dataset was preprocessed, if it was"""
+        preprocessed_name = self.store.preprocessed_name(self.store.dataset_name(filename))
+        state = self.store.read_artifact(preprocessed_name, IMPUTER_ARTIFACT)
+        return ImputationPipeline.from_dict(state["pipeline"]) if state else None
+    
+    def _preprocess_sync(self, filename: str, chunked: Optional[bool] = None) -> Dict[str, Any]:
+        name = self.resolve_dataset(filename)
+        preprocessed_name = self.store.preprocessed_name(name)
+        
+        # Same raw content as last time: the stored output and report are still valid
+        state = self.store.read_artifact(preprocessed_name, IMPUTER_ARTIFACT) if self.store.exists(preprocessed_name) else None
+        if state and state["source_version"] == self.content_version(name) and chunked in (None, state["chunked"]):
+            return state["report"]
         
-        # Save preprocessed data
-        preprocessed_path = file_path.replace(".csv", "_preprocessed.csv")
-        df.to_csv(preprocessed_path, index=False)
+        if chunked is None:
+            chunked = self._is_large(self.store.size_bytes(name))
         
-        preprocessing_report["preprocessed_shape"] = df.shape
-        preprocessing_report["preprocessed_path"] = preprocessed_path
+        if chunked:
+            staging_dir = self.store.stage(preprocessed_name)
+            
+            def write_chunk(index: int, chunk: pd.DataFrame):
+                self.store.write_part(staging_dir, index, pa.Table.from_pandas(chunk, preserve_index=False))
+            
+            with tempfile.TemporaryDirectory(dir=self.data_path, prefix=f".{name}.spill") as spill_dir:
+                preprocessing_report, pipeline = preprocessing_service.preprocess_chunked(
+                    lambda: self.store.iter_frames(name, settings.CHUNK_ROWS),
+                    self.store.empty_frame(name),
+                    write_chunk,
+                    Path(spill_dir)
+                )
+            self.store.commit(preprocessed_name, staging_dir, source=name)
+        else:
+            df, preprocessing_report, pipeline = preprocessing_service.preprocess(self.load_dataset_sync(name))
+            # Save preprocessed data to the columnar store
+            self.store.write_table(preprocessed_name, pa.Table.from_pandas(df, preserve_index=False), source=name)
         
+        preprocessing_report["preprocessed_path"] = str(self.store.dataset_dir(preprocessed_name))
+        self._save_imputer(name, pipeline, preprocessing_report, chunked)
         return preprocessing_report
+    
+    async def preprocess_data(self, filename: str, chunked: Optional[bool] = None) -> Dict[str, Any]:
+        """Automated preprocessing
+        
+        Datasets of CHUNKED_PROCESSING_MIN_BYTES or more (or chunked=True) are
+        streamed in CHUNK_ROWS batches instead of being loaded into memory.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._preprocess_sync, filename, chunked)
 
 data_service = DataService()
@@ -0,0 +1,90 @@
+import pandas as pd
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Callable, Tuple
+import threading
+from app.config import settings
+
+
+class DatasetCache:
+    """Process-wide LRU cache of loaded DataFrames, bounded by a byte budget
+    
+    Entries are keyed by the file a frame was loaded from plus its mtime, size
+    and inode, so rewriting the file invalidates the entry without any explicit
+    bookkeeping. Cached frames are shared between requests and must be treated
+    as read-only.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def _key(path: Path) -> Tuple:
+        stat = path.stat()
+        return (str(path), stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    
+    def get_or_load(self, path: Path, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """Return the cached frame for path, calling loader on a miss"""
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        
+        df = loader()
+        if self.max_bytes <= 0:
+            return df
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return df
+        
+        with self._lock:
+            # Older versions of the same file can never be hit again
+            for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self._drop(stale)
+            if key not in self._entries:
+                self._entries[key] = (df, size)
+                self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return df
+    
+    def _drop(self, key: Tuple):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+    
+    def invalidate(self, path: Path):
+        """Drop every cached version of path"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == str(path)]:
+                self._drop(key)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+dataset_cache = DatasetCache(settings.DATASET_CACHE_MAX_BYTES)
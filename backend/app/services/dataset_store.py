@@ -0,0 +1,345 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterator
+import errno
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from app.config import settings
+
+MANIFEST_NAME = "manifest.json"
+FINGERPRINT_INDEX_NAME = "fingerprints.json"
+PREPROCESSED_SUFFIX = "_preprocessed"
+# Extensions stripped from a filename to get its dataset name (longest first)
+DATASET_EXTENSIONS = (".csv.gz", ".csv.zst", ".csv", ".arrow")
+# Staging directories untouched for this long were left behind by a failed ingest
+STALE_STAGING_SECONDS = 24 * 3600
+
+
+def unify_part_schemas(tables: List[pa.Table]) -> pa.Schema:
+    """Common schema for parts that were parsed and compacted independently
+    
+    Numeric widths are promoted, a column that is categorical in some parts is
+    dictionary-encoded in all of them, and columns whose types cannot be merged
+    (e.g. numeric in one part, text in another) fall back to strings.
+    """
+    names = tables[0].column_names
+    for table in tables[1:]:
+        if table.column_names != names:
+            raise ValueError(f"Dataset parts have different columns: {names} vs {table.column_names}")
+    
+    fields = []
+    for i, name in enumerate(names):
+        types = [table.schema.field(i).type for table in tables]
+        if any(pa.types.is_dictionary(t) for t in types):
+            types = [t if pa.types.is_dictionary(t) or pa.types.is_null(t) else pa.dictionary(pa.int32(), t) for t in types]
+        try:
+            fields.append(pa.unify_schemas(
+                [pa.schema([(name, t)]) for t in types], promote_options="permissive"
+            ).field(0))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Cast a part to the dataset schema"""
+    columns = []
+    for column, field in zip(table.columns, schema):
+        if pa.types.is_dictionary(field.type) and not pa.types.is_dictionary(column.type):
+            column = column.cast(field.type.value_type).dictionary_encode()
+        columns.append(column.cast(field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+class DatasetStore:
+    """Columnar copies of uploaded datasets, stored as Arrow IPC files under DATA_STORAGE_PATH
+    
+    Each dataset lives in its own directory next to the raw upload:
+        
+        data/sales.csv                    raw upload
+        data/sales/manifest.json          schema, row count and part list
+        data/sales/part-00000.arrow       uncompressed Arrow IPC, memory-mapped on read
+        data/sales_preprocessed/...       output of preprocess_data, same layout
+        data/sales_preprocessed/imputer.json   fitted imputation pipeline (artifact)
+        data/sales/profile.json           column profile and its sketches (artifact)
+        data/fingerprints.json            sha256 of upload content -> dataset and ingest report
+    """
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.DATA_STORAGE_PATH)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index_lock = threading.Lock()
+    
+    def dataset_name(self, filename: str) -> str:
+        """Map an uploaded filename (or an existing dataset name) to its dataset name"""
+        name = Path(filename).name
+        for ext in DATASET_EXTENSIONS:
+            if name.endswith(ext):
+                return name[:-len(ext)]
+        return name
+    
+    def preprocessed_name(self, name: str) -> str:
+        return name if name.endswith(PREPROCESSED_SUFFIX) else f"{name}{PREPROCESSED_SUFFIX}"
+    
+    def dataset_dir(self, name: str) -> Path:
+        return self.root / name
+    
+    def manifest_path(self, name: str) -> Path:
+        return self.dataset_dir(name) / MANIFEST_NAME
+    
+    def exists(self, name: str) -> bool:
+        return self.manifest_path(name).exists()
+    
+    def manifest(self, name: str) -> Dict[str, Any]:
+        path = self.manifest_path(name)
+        if not path.exists():
+            raise FileNotFoundError(f"Dataset '{name}' not found in {self.root}")
+        with open(path) as f:
+            return json.load(f)
+    
+    def legacy_csv(self, name: str) -> Optional[Path]:
+        """Raw CSV for a dataset that was uploaded before the columnar store existed"""
+        path = self.root / f"{name}.csv"
+        return path if path.exists() else None
+    
+    def stage(self, name: str) -> Path:
+        """Fresh staging directory that parts are written to before commit()
+        
+        Unique per call, so concurrent ingests of the same name never touch each
+        other's parts; ones abandoned by failed ingests are removed here later.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        cutoff = time.time() - STALE_STAGING_SECONDS
+        for stale in self.root.glob(f".{name}.*.tmp"):
+            try:
+                if stale.stat().st_mtime < cutoff:
+                    shutil.rmtree(stale, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+        return Path(tempfile.mkdtemp(dir=self.root, prefix=f".{name}.", suffix=".tmp"))
+    
+    @staticmethod
+    def part_name(index: int) -> str:
+        return f"part-{index:05d}.arrow"
+    
+    @staticmethod
+    def _write_ipc(path: Path, table: pa.Table):
+        with pa.OSFile(str(path), "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    
+    @staticmethod
+    def _read_ipc(path: Path) -> pa.Table:
+        source = pa.memory_map(str(path), "r")
+        return ipc.open_file(source).read_all()
+    
+    def write_part(self, staging_dir: Path, index: int, table: pa.Table) -> Path:
+        path = staging_dir / self.part_name(index)
+        self._write_ipc(path, table)
+        return path
+    
+    def commit(
+        self,
+        name: str,
+        staging_dir: Path,
+        source: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+        lineage: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Unify the staged parts' schemas, write the manifest and swap the dataset into place
+        
+        lineage lists the versions the content was appended to, oldest first,
+        with their row counts; a fresh commit has none.
+        """
+        parts = sorted(p.name for p in staging_dir.glob("part-*.arrow"))
+        if not parts:
+            raise ValueError(f"Dataset '{name}' has no parts")
+        tables = [self._read_ipc(staging_dir / part) for part in parts]
+        schema = unify_part_schemas(tables)
+        rows = 0
+        for part, table in zip(parts, tables):
+            if not table.schema.equals(schema):
+                # Write beside the part and swap: the source table is still memory-mapped
+                conformed_path = staging_dir / f"{part}.conformed"
+                self._write_ipc(conformed_path, conform_table(table, schema))
+                os.replace(conformed_path, staging_dir / part)
+            rows += table.num_rows
+        
+        manifest = {
+            "name": name,
+            "source": source,
+            "fingerprint": fingerprint,
+            "parts": parts,
+            "rows": rows,
+            "columns": len(schema),
+            "column_names": schema.names,
+            "schema": [str(field.type) for field in schema],
+            "lineage": lineage or [],
+            "created_at": pd.Timestamp.now().isoformat()
+        }
+        with open(staging_dir / MANIFEST_NAME, "w") as f:
+            json.dump(manifest, f, indent=2)
+        
+        # Swap the finished directory into place so readers never see a half-written dataset
+        dataset_dir = self.dataset_dir(name)
+        while True:
+            if dataset_dir.exists():
+                shutil.rmtree(dataset_dir, ignore_errors=True)
+            try:
+                os.replace(staging_dir, dataset_dir)
+                break
+            except OSError as e:
+                # A concurrent commit of the same name swapped its directory in first; the last one wins
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+        return manifest
+    
+    def append(
+        self,
+        name: str,
+        staging_dir: Path,
+        fingerprint: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Commit parts staged after the dataset's existing ones (numbered from len(parts))
+        
+        Existing parts are hard-linked into the staging directory instead of being
+        copied; commit() only rewrites them if the new rows widen the schema.
+        """
+        manifest = self.manifest(name)
+        for part in manifest["parts"]:
+            os.link(self.dataset_dir(name) / part, staging_dir / part)
+        lineage = manifest.get("lineage", []) + [{"version": self.version(manifest), "rows": manifest["rows"]}]
+        return self.commit(name, staging_dir, source=manifest["source"], fingerprint=fingerprint, lineage=lineage)
+    
+    def link(self, source: str, name: str) -> Dict[str, Any]:
+        """Commit the content of dataset `source` under `name` too
+        
+        Parts and artifacts are hard-linked, not copied; they are only ever
+        replaced, never written in place, so the two datasets stay independent.
+        """
+        manifest = self.manifest(source)
+        staging_dir = self.stage(name)
+        for path in self.dataset_dir(source).iterdir():
+            if path.is_file() and path.name != MANIFEST_NAME:
+                os.link(path, staging_dir / path.name)
+        return self.commit(
+            name, staging_dir,
+            source=manifest["source"], fingerprint=manifest["fingerprint"], lineage=manifest.get("lineage")
+        )
+    
+    @staticmethod
+    def version(manifest: Dict[str, Any]) -> str:
+        """Identifies a dataset's content: its fingerprint, or its commit time when it has none"""
+        return manifest["fingerprint"] or manifest["created_at"]
+    
+    def write_table(
+        self,
+        name: str,
+        table: pa.Table,
+        source: Optional[str] = None,
+        fingerprint: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Replace the dataset with a single Arrow part and write its manifest"""
+        staging_dir = self.stage(name)
+        self.write_part(staging_dir, 0, table)
+        return self.commit(name, staging_dir, source=source, fingerprint=fingerprint)
+    
+    def part_paths(self, name: str) -> List[Path]:
+        manifest = self.manifest(name)
+        return [self.dataset_dir(name) / part for part in manifest["parts"]]
+    
+    def read_table(self, name: str, first_part: int = 0) -> pa.Table:
+        """Memory-map every part of the dataset; no bytes are copied until they are used"""
+        tables = [self._read_ipc(path) for path in self.part_paths(name)[first_part:]]
+        if len(tables) == 1:
+            return tables[0]
+        return pa.concat_tables(tables)
+    
+    def size_bytes(self, name: str) -> int:
+        """Bytes of the dataset's Arrow parts, roughly its size in memory"""
+        return sum(path.stat().st_size for path in self.part_paths(name))
+    
+    def empty_frame(self, name: str) -> pd.DataFrame:
+        """Zero-row frame with the dataset's columns and dtypes"""
+        return self.read_table(name).schema.empty_table().to_pandas()
+    
+    def iter_frames(self, name: str, batch_rows: int, first_part: int = 0) -> Iterator[pd.DataFrame]:
+        """Yield the dataset (from first_part on) as DataFrames of at most batch_rows rows
+        
+        Only the current batch is materialized; the rest stays in the memory map.
+        """
+        for batch in self.read_table(name, first_part).to_batches(max_chunksize=batch_rows):
+            yield batch.to_pandas()
+    
+    def load(self, name: str) -> pd.DataFrame:
+        """Load the dataset as a DataFrame
+        
+        Primitive columns without nulls are backed directly by the memory map and
+        are therefore read-only; copy the frame before modifying it in place.
+        """
+        return self.read_table(name).to_pandas(split_blocks=True)
+    
+    def write_artifact(self, name: str, artifact: str, data: Dict[str, Any]):
+        """Store a small JSON artifact inside the dataset's directory
+        
+        Artifacts live and die with the dataset version: commit() replaces the
+        directory, so anything derived from the old rows is dropped with them.
+        """
+        path = self.dataset_dir(name) / artifact
+        tmp_path = path.with_name(f".{artifact}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    
+    def has_artifact(self, name: str, artifact: str) -> bool:
+        return (self.dataset_dir(name) / artifact).exists()
+    
+    def read_artifact(self, name: str, artifact: str) -> Optional[Dict[str, Any]]:
+        path = self.dataset_dir(name) / artifact
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+    
+    def _read_fingerprint_index(self) -> Dict[str, Any]:
+        path = self.root / FINGERPRINT_INDEX_NAME
+        if not path.exists():
+            return {}
+        with open(path) as f:
+            return json.load(f)
+    
+    def _write_fingerprint_index(self, index: Dict[str, Any]):
+        path = self.root / FINGERPRINT_INDEX_NAME
+        tmp_path = path.with_name(f".{FINGERPRINT_INDEX_NAME}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, path)
+    
+    def lookup_fingerprint(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Index entry for content that was already ingested, if its dataset still exists"""
+        with self._index_lock:
+            entry = self._read_fingerprint_index().get(fingerprint)
+        if entry is None or not self.exists(entry["dataset"]):
+            return None
+        return entry
+    
+    def record_fingerprint(self, fingerprint: str, name: str, report: Dict[str, Any]):
+        """Map content to its dataset, dropping entries for content the dataset no longer holds"""
+        with self._index_lock:
+            index = self._read_fingerprint_index()
+            index = {fp: entry for fp, entry in index.items() if entry["dataset"] != name}
+            index[fingerprint] = {"dataset": name, "report": report}
+            self._write_fingerprint_index(index)
+    
+    def delete(self, name: str):
+        dataset_dir = self.dataset_dir(name)
+        if dataset_dir.exists():
+            shutil.rmtree(dataset_dir)
+
+dataset_store = DatasetStore()
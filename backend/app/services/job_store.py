@@ -0,0 +1,309 @@
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+import contextlib
+import json
+import sqlite3
+import uuid
+from app.config import settings
+
+JOBS_DB_NAME = "jobs.db"
+# Statuses a job never leaves
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    request_key TEXT,
+    eta_seconds REAL,
+    heartbeat_at TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq);
+CREATE TABLE IF NOT EXISTS estimator_timings (
+    job_id TEXT NOT NULL,
+    estimator TEXT NOT NULL,
+    problem_type TEXT,
+    rows INTEGER,
+    features INTEGER,
+    folds INTEGER,
+    seconds REAL NOT NULL,
+    score REAL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS estimator_timings_estimator ON estimator_timings (estimator);
+"""
+# Columns added to jobs after the table was first created, with their definitions
+_MIGRATIONS = {"request_key": "TEXT", "eta_seconds": "REAL", "heartbeat_at": "TEXT"}
+_JSON_FIELDS = ("params", "result")
+# Statuses of jobs an identical request can reuse instead of running again
+REUSABLE_STATUSES = ("queued", "running", "completed")
+# Heartbeats are stamped and compared by SQLite in UTC: workers on other hosts may have other local time zones
+_SQL_UTC_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+
+class JobStore:
+    """Persistent job table in a SQLite file under MODEL_STORAGE_PATH
+    
+    Every state change is a single UPDATE guarded by the expected status, so a
+    job is claimed by exactly one worker and a cancelled job is never started.
+    Connections are opened per call; the store is safe to share between threads,
+    and between processes and hosts that open the same file (see app.worker).
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else Path(settings.MODEL_STORAGE_PATH) / JOBS_DB_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_request_key ON jobs (request_key)")
+    
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Autocommit connection, closed on exit"""
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _now() -> str:
+        # UTC like the heartbeats: queue order compares created_at written by hosts in other time zones
+        return pd.Timestamp.now(tz="UTC").isoformat()
+    
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for field in _JSON_FIELDS:
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+    
+    def _update(self, job_id: str, expected_status: str, **fields) -> bool:
+        """Set fields on the job if it is in expected_status; True if it was"""
+        for field in _JSON_FIELDS:
+            if field in fields:
+                fields[field] = json.dumps(fields[field], default=str)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ?",
+                (*fields.values(), job_id, expected_status)
+            )
+            return cursor.rowcount > 0
+    
+    def create(self, kind: str, params: Dict[str, Any], request_key: Optional[str] = None) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            self._insert(conn, job_id, kind, params, request_key)
+        return self.get(job_id)
+    
+    def _insert(self, conn: sqlite3.Connection, job_id: str, kind: str, params: Dict[str, Any], request_key: Optional[str]):
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, params, request_key, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, json.dumps(params), request_key, self._now())
+        )
+    
+    def create_or_reuse(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        request_key: str,
+        is_valid: Callable[[Dict[str, Any]], bool]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """The latest queued, running or completed job for request_key, else a new one
+        
+        Jobs being cancelled are skipped, and completed jobs are only reused if
+        is_valid(job) holds (e.g. their model still exists). The lookup and the insert happen in one write transaction,
+        so identical requests arriving together share a single job. Returns the
+        job and whether it was reused.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    f"SELECT * FROM jobs WHERE request_key = ? AND status IN ({', '.join('?' * len(REUSABLE_STATUSES))}) "
+                    "ORDER BY created_at DESC",
+                    (request_key, *REUSABLE_STATUSES)
+                ).fetchall()
+                for row in rows:
+                    job = self._row(row)
+                    if job["cancel_requested"]:
+                        continue
+                    if job["status"] != "completed" or is_valid(job):
+                        conn.execute("COMMIT")
+                        return job, True
+                job_id = uuid.uuid4().hex
+                self._insert(conn, job_id, kind, params, request_key)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id), False
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._row(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+        query, args = "SELECT * FROM jobs", ()
+        if status:
+            query, args = query + " WHERE status = ?", (status,)
+        with self._connect() as conn:
+            rows = conn.execute(f"{query} ORDER BY created_at DESC LIMIT ?", (*args, limit)).fetchall()
+        return [self._row(row) for row in rows]
+    
+    def claim(self, job_id: str, worker: str) -> bool:
+        """Move a queued job to running; False if it was cancelled or claimed already"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = {_SQL_UTC_NOW} "
+                "WHERE id = ? AND status = 'queued'",
+                (worker, self._now(), job_id)
+            )
+            return cursor.rowcount > 0
+    
+    def claim_next(self, worker: str, kind: str) -> Optional[Dict[str, Any]]:
+        """Move the oldest queued job of this kind to running and return it; None if the queue is empty
+        
+        The lookup and the update happen in one write transaction, so workers
+        polling the same table never claim the same job.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE kind = ? AND status = 'queued' ORDER BY created_at LIMIT 1",
+                    (kind,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        f"UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = {_SQL_UTC_NOW} "
+                        "WHERE id = ?",
+                        (worker, self._now(), row["id"])
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+    
+    def heartbeat(self, job_id: str):
+        """Record that the worker running the job is alive"""
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = {_SQL_UTC_NOW} WHERE id = ? AND status = 'running'",
+                (job_id,)
+            )
+    
+    def report(
+        self,
+        job_id: str,
+        stage: str,
+        progress: float,
+        message: Optional[str] = None,
+        eta_seconds: Optional[float] = None
+    ):
+        self._update(
+            job_id, "running",
+            stage=stage, progress=progress, message=message, eta_seconds=eta_seconds
+        )
+    
+    def add_event(self, job_id: str, event_type: str, data: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, event_type, json.dumps(data, default=str), self._now())
+            )
+    
+    def events(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """A job's events with a sequence number above after_seq, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq)
+            ).fetchall()
+        return [{**dict(row), "data": json.loads(row["data"])} for row in rows]
+    
+    def record_timing(self, job_id: str, estimator: str, seconds: float, **fields):
+        """Store how long an estimator took to cross-validate (rows, features, folds, score, problem_type)"""
+        row = {"job_id": job_id, "estimator": estimator, "seconds": seconds, **fields, "created_at": self._now()}
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO estimator_timings ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values())
+            )
+    
+    def timings(self, estimator: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Recorded estimator timings, most recent first"""
+        query, args = "SELECT * FROM estimator_timings", ()
+        if estimator:
+            query, args = query + " WHERE estimator = ?", (estimator,)
+        with self._connect() as conn:
+            rows = conn.execute(f"{query} ORDER BY created_at DESC LIMIT ?", (*args, limit)).fetchall()
+        return [dict(row) for row in rows]
+    
+    def finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        fields = {"status": status, "result": result, "error": error, "finished_at": self._now()}
+        if status == "completed":
+            fields["progress"] = 1.0
+        self._update(job_id, "running", **fields)
+    
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job outright, or flag a running one for its worker to stop"""
+        if not self._update(
+            job_id, "queued",
+            status="cancelled", cancel_requested=1, finished_at=self._now()
+        ):
+            self._update(job_id, "running", cancel_requested=1)
+        return self.get(job_id)
+    
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+    
+    def fail_stale(self, error: str, timeout_seconds: float) -> int:
+        """Fail running jobs whose owner has sent no heartbeat for timeout_seconds; returns how many
+        
+        Every running job is heartbeated by the process that runs it, whether an
+        API pool or a queue worker. Jobs without any heartbeat were started
+        before heartbeats existed and count as stale.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE status = 'running' AND (heartbeat_at IS NULL "
+                "OR julianday(heartbeat_at) < julianday('now') - ? / 86400.0)",
+                (error, self._now(), timeout_seconds)
+            )
+            return cursor.rowcount
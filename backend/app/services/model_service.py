@@ -4,8 +4,10 @@ from typing import Dict, Any, Optional
 from pycaret.regression import load_model as load_model_reg, predict_model as predict_model_reg
 from pycaret.classification import load_model as load_model_clf, predict_model as predict_model_clf
 from app.config import settings
+from app.services.preprocessing_service import ImputationPipeline
 import joblib
 import asyncio
+import json
 
 class ModelService:
     def __init__(self):
@@ -64,11 +66,16 @@ class ModelService:
             if not model_loaded:
                 raise ValueError(f"Could not load model {model_id}")
             
+            metadata = self._load_metadata(model_base_path)
+            imputer = metadata.get("imputer")
+            
             # Cache the model
             self._loaded_models[model_id] = {
                 "model": model,
                 "type": model_type,
-                "path": str(model_base_path)
+                "path": str(model_base_path),
+                "metadata": metadata,
+                "imputer": ImputationPipeline.from_dict(imputer) if imputer else None
             }
             
             return {
@@ -80,6 +87,14 @@ class ModelService:
         except Exception as e:
             raise ValueError(f"Failed to load model {model_id}: {str(e)}")
     
+    def _load_metadata(self, model_base_path: Path) -> Dict[str, Any]:
+        """Sidecar written by the trainer; models saved before it existed have none"""
+        metadata_path = model_base_path.with_suffix('.json')
+        if not metadata_path.exists():
+            return {}
+        with open(metadata_path) as f:
+            return json.load(f)
+    
     async def predict(self, model_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Make predictions using a loaded model"""
         try:
@@ -101,6 +116,10 @@ class ModelService:
             else:
                 raise ValueError("Data must be a dict or list of dicts")
             
+            # Impute with the training data's fill values; omitted features are filled too
+            if model_info["imputer"] is not None:
+                df = model_info["imputer"].transform(df, columns=model_info["metadata"].get("features"))
+            
             # Run prediction in executor to avoid blocking
             loop = asyncio.get_event_loop()
             predictions = await loop.run_in_executor(
@@ -39,6 +39,11 @@ class OpenAIService:
             return None
         
         try:
+            # Column profiles (when the analysis came from one) point at the columns worth mentioning
+            profiles = analysis_results.get('column_profiles') or []
+            incomplete = sorted((c for c in profiles if c['null_count']), key=lambda c: c['null_rate'], reverse=True)[:5]
+            missing_by_column = ', '.join(f"{c['name']} ({c['null_rate']:.1%})" for c in incomplete) or 'None'
+            
             prompt = f"""You are a data science expert. Analyze this dataset and provide concise, actionable insights.
 
 Dataset Summary:
@@ -47,6 +52,7 @@ Dataset Summary:
 - Numerical columns: {data_summary.get('numerical_columns', 0)}
 - Categorical columns: {data_summary.get('categorical_columns', 0)}
 - Missing values: {data_summary.get('missing_values', 0)}
+- Columns with the most missing values: {missing_by_column}
 
 Analysis Results:
 - Problem Type: {analysis_results.get('problem_type', 'Unknown')}
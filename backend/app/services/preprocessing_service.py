@@ -0,0 +1,250 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Tuple, Callable, Iterator, Optional
+from app.services.sketches import QuantileSketch, FrequentItemsSketch, DuplicateDetector
+
+# Fill value for categorical columns that have no observed values at all
+UNKNOWN_CATEGORY = "Unknown"
+
+
+def column_mode(series: pd.Series) -> Any:
+    """Most frequent non-null value (smallest on ties, like Series.mode()[0]), or UNKNOWN_CATEGORY"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        if counts.sum() == 0:
+            return UNKNOWN_CATEGORY
+        return series.cat.categories[int(np.argmax(counts))]
+    
+    counts = series.value_counts(dropna=True, sort=True)
+    if counts.empty:
+        return UNKNOWN_CATEGORY
+    top = counts.index[counts.to_numpy() == counts.iloc[0]]
+    try:
+        return min(top)
+    except TypeError:
+        return top[0]
+
+
+def fill_missing(df: pd.DataFrame, fill_map: Dict[str, Any]) -> pd.DataFrame:
+    """Apply every fill value in one fillna call"""
+    fill_map = {col: value for col, value in fill_map.items() if col in df.columns}
+    if not fill_map:
+        return df
+    extended = {}
+    for col, value in fill_map.items():
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype) and value not in dtype.categories:
+            extended[col] = df[col].cat.add_categories([value])
+    if extended:
+        df = df.assign(**extended)
+    return df.fillna(fill_map)
+
+
+def _json_value(value: Any) -> Any:
+    """Plain Python value for numpy scalars so fill values survive a JSON round trip"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class ImputationPipeline:
+    """Fitted fill values for every column, persisted next to the preprocessed dataset
+    
+    Alongside the fill values it keeps mergeable sketches of the raw column values,
+    so rows appended later update the medians and modes without re-reading the
+    data already seen. transform() is the same single fillna used during
+    preprocessing and is what the prediction path applies to incoming rows.
+    """
+    
+    def __init__(self, numerical: List[str], categorical: List[str]):
+        self.numerical = numerical
+        self.categorical = categorical
+        self.fill_values: Dict[str, Any] = {}
+        self.medians = {col: QuantileSketch() for col in numerical}
+        self.modes = {col: FrequentItemsSketch() for col in categorical}
+        self.rows = 0
+    
+    def update(self, df: pd.DataFrame) -> "ImputationPipeline":
+        """Feed raw (unfilled) rows into the sketches without refreshing the fill values"""
+        for col in self.numerical:
+            self.medians[col].update(df[col].to_numpy(dtype=np.float64, na_value=np.nan))
+        for col in self.categorical:
+            self.modes[col].update(df[col].dropna())
+        self.rows += len(df)
+        return self
+    
+    def refresh(self) -> "ImputationPipeline":
+        """Recompute the fill values from the sketches (approximate medians)"""
+        for col in self.numerical:
+            median = self.medians[col].median()
+            if median is not None:
+                self.fill_values[col] = median
+        for col in self.categorical:
+            mode = self.modes[col].mode()
+            self.fill_values[col] = UNKNOWN_CATEGORY if mode is None else mode
+        return self
+    
+    def partial_fit(self, df: pd.DataFrame) -> "ImputationPipeline":
+        return self.update(df).refresh()
+    
+    def transform(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Fill missing values; columns absent from df but listed in columns are added and filled"""
+        absent = [col for col in (columns or []) if col not in df.columns]
+        if absent:
+            df = df.assign(**{col: np.nan for col in absent})
+        has_missing = df.isnull().any()
+        return fill_missing(df, {
+            col: value for col, value in self.fill_values.items()
+            if col in df.columns and has_missing[col]
+        })
+    
+    def to_dict(self, include_sketches: bool = True) -> Dict[str, Any]:
+        data = {
+            "numerical": self.numerical,
+            "categorical": self.categorical,
+            "fill_values": {col: _json_value(value) for col, value in self.fill_values.items()},
+            "rows": self.rows
+        }
+        if include_sketches:
+            data["medians"] = {col: sketch.to_dict() for col, sketch in self.medians.items()}
+            data["modes"] = {col: sketch.to_dict() for col, sketch in self.modes.items()}
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ImputationPipeline":
+        pipeline = cls(data["numerical"], data["categorical"])
+        pipeline.fill_values = {col: value for col, value in data["fill_values"].items() if value is not None}
+        pipeline.rows = data["rows"]
+        if "medians" in data:
+            pipeline.medians = {col: QuantileSketch.from_dict(sketch) for col, sketch in data["medians"].items()}
+            pipeline.modes = {col: FrequentItemsSketch.from_dict(sketch) for col, sketch in data["modes"].items()}
+        return pipeline
+
+
+class PreprocessingService:
+    """Missing-value imputation and deduplication over whole frames
+    
+    Column statistics are computed in one vectorized pass, turned into a single
+    fill map and applied with one bulk fillna instead of per-column loops.
+    """
+    
+    def column_types(self, df: pd.DataFrame) -> Tuple[List[str], List[str]]:
+        numerical = df.select_dtypes(include=[np.number]).columns.tolist()
+        categorical = df.select_dtypes(include=['object', 'category']).columns.tolist()
+        return numerical, categorical
+    
+    def fill_values(
+        self,
+        df: pd.DataFrame,
+        numerical: List[str],
+        categorical: List[str]
+    ) -> Dict[str, Any]:
+        """Median for numerical and mode for categorical columns"""
+        fill_map = {}
+        if numerical:
+            fill_map.update(df[numerical].median().dropna().to_dict())
+        for col in categorical:
+            fill_map[col] = column_mode(df[col])
+        return fill_map
+    
+    def apply_fill(self, df: pd.DataFrame, fill_map: Dict[str, Any]) -> pd.DataFrame:
+        return fill_missing(df, fill_map)
+    
+    def preprocess(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any], ImputationPipeline]:
+        """Impute missing values and drop duplicate rows; returns the new frame, the report and the fitted pipeline"""
+        missing = df.isnull().sum()
+        duplicate_rows = int(df.duplicated().sum())
+        numerical, categorical = self.column_types(df)
+        
+        report = {
+            "original_shape": df.shape,
+            "missing_values": missing.to_dict(),
+            "duplicate_rows": duplicate_rows,
+            "numerical_columns": numerical,
+            "categorical_columns": categorical,
+            "preprocessing_applied": []
+        }
+        
+        # Exact statistics fill this dataset; the sketches are kept for later appends
+        pipeline = ImputationPipeline(numerical, categorical).update(df)
+        pipeline.fill_values = self.fill_values(df, numerical, categorical)
+        fill_map = {col: value for col, value in pipeline.fill_values.items() if missing[col] > 0}
+        if fill_map:
+            df = self.apply_fill(df, fill_map)
+            for col in numerical + categorical:
+                if col in fill_map:
+                    method = "median" if col in numerical else "mode"
+                    report["preprocessing_applied"].append(f"Filled missing values in {col} with {method}")
+        
+        if duplicate_rows > 0:
+            df = df[~df.duplicated()]
+            report["preprocessing_applied"].append("Removed duplicate rows")
+        
+        report["preprocessed_shape"] = df.shape
+        return df, report, pipeline
+    
+    def preprocess_chunked(
+        self,
+        frames: Callable[[], Iterator[pd.DataFrame]],
+        empty: pd.DataFrame,
+        write_chunk: Callable[[int, pd.DataFrame], None],
+        spill_dir: Path,
+        pipeline: Optional[ImputationPipeline] = None
+    ) -> Tuple[Dict[str, Any], ImputationPipeline]:
+        """Out-of-core variant of preprocess() for data larger than memory
+        
+        Pass one counts nulls, feeds mergeable sketches (KLL for medians,
+        Misra-Gries for modes) and spills row hashes to disk; pass two applies
+        the fill map, drops duplicates and hands each chunk to write_chunk.
+        Medians are approximate, and duplicates are detected on the rows as
+        loaded rather than after filling. Passing an existing pipeline continues
+        fitting it, which is how appended rows are preprocessed.
+        """
+        if pipeline is None:
+            pipeline = ImputationPipeline(*self.column_types(empty))
+        numerical, categorical = pipeline.numerical, pipeline.categorical
+        missing = pd.Series(0, index=empty.columns, dtype=np.int64)
+        duplicates = DuplicateDetector(spill_dir)
+        
+        for chunk in frames():
+            missing += chunk.isnull().sum()
+            pipeline.update(chunk)
+            duplicates.add(chunk)
+        pipeline.refresh()
+        
+        duplicate_mask = duplicates.duplicate_mask()
+        duplicate_rows = int(duplicate_mask.sum())
+        report = {
+            "original_shape": (duplicates.rows, len(empty.columns)),
+            "missing_values": missing.to_dict(),
+            "duplicate_rows": duplicate_rows,
+            "numerical_columns": numerical,
+            "categorical_columns": categorical,
+            "preprocessing_applied": []
+        }
+        
+        fill_map = {col: value for col, value in pipeline.fill_values.items() if missing.get(col, 0) > 0}
+        for col in numerical + categorical:
+            if col in fill_map:
+                method = "approximate median" if col in numerical else "mode"
+                report["preprocessing_applied"].append(f"Filled missing values in {col} with {method}")
+        if duplicate_rows > 0:
+            report["preprocessing_applied"].append("Removed duplicate rows")
+        
+        offset = 0
+        rows = 0
+        for index, chunk in enumerate(frames()):
+            keep = ~duplicate_mask[offset:offset + len(chunk)]
+            offset += len(chunk)
+            chunk = self.apply_fill(chunk, fill_map)[keep]
+            rows += len(chunk)
+            write_chunk(index, chunk)
+        
+        report["preprocessed_shape"] = (rows, len(empty.columns))
+        return report, pipeline
+
+preprocessing_service = PreprocessingService()
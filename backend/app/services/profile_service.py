@@ -0,0 +1,219 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Optional, Iterable
+from app.services.sketches import QuantileSketch, FrequentItemsSketch, HyperLogLog
+
+# Bump whenever the profile layout or its statistics change so stored profiles are rebuilt
+PROFILE_VERSION = 2
+HISTOGRAM_BINS = 20
+PROFILE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+TOP_K = 10
+
+
+def _is_float(dtype: str) -> bool:
+    try:
+        return pd.api.types.is_float_dtype(pd.api.types.pandas_dtype(dtype))
+    except TypeError:
+        return False
+
+
+class ColumnProfile:
+    """Mergeable statistics of one column
+    
+    Numeric columns keep streaming moments (count, mean, M2) and a KLL sketch
+    for quantiles and the histogram; other columns keep Misra-Gries counts for
+    top values. Every column has a null count and a HyperLogLog for distinct
+    values. Integer columns also get top values; float columns keep them only
+    while they are exact, since continuous values would just churn the summary.
+    """
+    
+    def __init__(self, name: str, dtype: str, numeric: bool, frequent: bool):
+        self.name = name
+        self.dtype = dtype
+        self.numeric = numeric
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.quantiles = QuantileSketch() if numeric else None
+        self.frequent = FrequentItemsSketch() if frequent else None
+        self.distinct = HyperLogLog()
+        self.exact_frequent_only = _is_float(dtype)
+    
+    @classmethod
+    def for_series(cls, name: str, series: pd.Series) -> "ColumnProfile":
+        dtype = series.dtype
+        numeric = pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        return cls(name, str(dtype), numeric, True)
+    
+    def _merge_moments(self, count: int, mean: float, m2: float):
+        # Chan et al.'s pairwise update, so chunk order and size don't affect precision
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+    
+    def update(self, series: pd.Series) -> "ColumnProfile":
+        nulls = int(series.isnull().sum())
+        self.nulls += nulls
+        if self.numeric:
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)] if nulls else values
+            if len(values):
+                mean = float(values.mean())
+                self._merge_moments(len(values), mean, float(((values - mean) ** 2).sum()))
+                self.quantiles.update(values)
+        else:
+            self.count += len(series) - nulls
+        if self.frequent is not None:
+            values = series.dropna() if nulls else series
+            if self.exact_frequent_only and values.nunique() > self.frequent.capacity:
+                self.frequent = None  # Saves building counts that would be dropped right away
+            else:
+                self.frequent.update(values)
+                self._drop_inexact_frequent()
+        self.distinct.update(series)
+        return self
+    
+    def merge(self, other: "ColumnProfile") -> "ColumnProfile":
+        self.nulls += other.nulls
+        if self.numeric:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.quantiles.merge(other.quantiles)
+        else:
+            self.count += other.count
+        if self.frequent is not None and other.frequent is not None:
+            self.frequent.merge(other.frequent)
+            self._drop_inexact_frequent()
+        else:
+            self.frequent = None
+        self.distinct.merge(other.distinct)
+        return self
+    
+    def _drop_inexact_frequent(self):
+        if self.exact_frequent_only and self.frequent.error > 0:
+            self.frequent = None
+    
+    def distinct_count(self) -> Dict[str, Any]:
+        """Exact while the frequent-items summary has not overflowed, HyperLogLog otherwise"""
+        if self.frequent is not None and self.frequent.error == 0:
+            return {"value": len(self.frequent.counts), "exact": True}
+        return {"value": round(self.distinct.estimate()), "exact": False}
+    
+    def summary(self) -> Dict[str, Any]:
+        rows = self.count + self.nulls
+        summary = {
+            "name": self.name,
+            "dtype": self.dtype,
+            "kind": "numeric" if self.numeric else "categorical",
+            "count": self.count,
+            "null_count": self.nulls,
+            "null_rate": self.nulls / rows if rows else 0.0,
+            "distinct": self.distinct_count()
+        }
+        if self.numeric and self.count:
+            summary.update({
+                "min": self.quantiles.min,
+                "max": self.quantiles.max,
+                "mean": self.mean,
+                "std": float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0,
+                "quantiles": dict(zip(
+                    [f"p{round(q * 100)}" for q in PROFILE_QUANTILES],
+                    self.quantiles.quantiles(PROFILE_QUANTILES)
+                )),
+                "histogram": self.quantiles.histogram(HISTOGRAM_BINS)
+            })
+        if self.frequent is not None:
+            summary["top_values"] = self.frequent.top(TOP_K)
+        return summary
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "dtype": self.dtype,
+            "numeric": self.numeric,
+            "count": self.count,
+            "nulls": self.nulls,
+            "mean": self.mean,
+            "m2": self.m2,
+            "quantiles": self.quantiles.to_dict() if self.quantiles is not None else None,
+            "frequent": self.frequent.to_dict() if self.frequent is not None else None,
+            "distinct": self.distinct.to_dict()
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnProfile":
+        profile = cls(data["name"], data["dtype"], data["numeric"], data["frequent"] is not None)
+        profile.count = data["count"]
+        profile.nulls = data["nulls"]
+        profile.mean = data["mean"]
+        profile.m2 = data["m2"]
+        if data["quantiles"] is not None:
+            profile.quantiles = QuantileSketch.from_dict(data["quantiles"])
+        if data["frequent"] is not None:
+            profile.frequent = FrequentItemsSketch.from_dict(data["frequent"])
+        profile.distinct = HyperLogLog.from_dict(data["distinct"])
+        return profile
+
+
+class DatasetProfile:
+    """Column profiles of a whole dataset, built chunk by chunk and mergeable across appends"""
+    
+    def __init__(self, columns: Optional[Dict[str, ColumnProfile]] = None, rows: int = 0):
+        self.columns: Dict[str, ColumnProfile] = columns or {}
+        self.rows = rows
+    
+    @classmethod
+    def for_frame(cls, empty: pd.DataFrame) -> "DatasetProfile":
+        """Empty profile with a column for each column of the (zero-row) frame"""
+        return cls({name: ColumnProfile.for_series(name, empty[name]) for name in empty.columns})
+    
+    def update(self, chunk: pd.DataFrame) -> "DatasetProfile":
+        for name in chunk.columns:
+            if name not in self.columns:
+                self.columns[name] = ColumnProfile.for_series(name, chunk[name])
+            self.columns[name].update(chunk[name])
+        self.rows += len(chunk)
+        return self
+    
+    def merge(self, other: "DatasetProfile") -> "DatasetProfile":
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        self.rows += other.rows
+        return self
+    
+    def summary(self) -> Dict[str, Any]:
+        columns = [column.summary() for column in self.columns.values()]
+        return {
+            "rows": self.rows,
+            "columns": columns,
+            "numerical_columns": [c["name"] for c in columns if c["kind"] == "numeric"],
+            "categorical_columns": [c["name"] for c in columns if c["kind"] == "categorical"],
+            "missing_values": sum(c["null_count"] for c in columns)
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"rows": self.rows, "columns": [column.to_dict() for column in self.columns.values()]}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DatasetProfile":
+        columns = [ColumnProfile.from_dict(column) for column in data["columns"]]
+        return cls({column.name: column for column in columns}, data["rows"])
+
+
+class ProfileService:
+    """One-pass column profiling over chunked datasets"""
+    
+    def profile(self, frames: Iterable[pd.DataFrame], profile: DatasetProfile) -> DatasetProfile:
+        """Profile every chunk in a single pass, continuing from the given profile"""
+        for chunk in frames:
+            profile.update(chunk)
+        return profile
+
+profile_service = ProfileService()
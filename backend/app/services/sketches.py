@@ -0,0 +1,322 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+class QuantileSketch:
+    """Mergeable KLL quantile sketch over numeric values
+    
+    Values are kept in levels of compactors; an item at level h stands for 2**h
+    input values. When a level outgrows its capacity it is sorted and every
+    other item (random offset) is promoted. Rank error is roughly 1.7 / k with
+    memory O(k), independent of how many values were seen.
+    """
+    
+    def __init__(self, k: int = 512, seed: int = 0):
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+    
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+    
+    def update(self, values) -> "QuantileSketch":
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+    
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+    
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so weights are preserved exactly
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                promoted = pairs[int(self._rng.integers(2))::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+    
+    def quantiles(self, qs) -> List[Optional[float]]:
+        if self.count == 0:
+            return [None for _ in qs]
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+            elif q >= 1:
+                result.append(self.max)
+            else:
+                idx = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+                result.append(float(values[min(idx, len(values) - 1)]))
+        return result
+    
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+    
+    def counts_below(self, points) -> np.ndarray:
+        """Estimated number of values <= each point"""
+        points = np.asarray(points, dtype=np.float64)
+        if self.count == 0:
+            return np.zeros(len(points))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.concatenate([[0.0], np.cumsum(weights[order])])
+        return cumulative[np.searchsorted(values[order], points, side="right")]
+    
+    def histogram(self, bins: int = 20) -> Dict[str, List[float]]:
+        """Equal-width histogram between min and max, read off the sketch's CDF"""
+        if self.count == 0:
+            return {"edges": [], "counts": []}
+        edges = np.linspace(self.min, self.max, bins + 1) if self.max > self.min else np.array([self.min, self.max])
+        below = self.counts_below(edges[1:-1])
+        counts = np.diff(np.concatenate([[0.0], below, [float(self.count)]]))
+        return {"edges": edges.tolist(), "counts": np.round(counts).astype(int).tolist()}
+    
+    def median(self) -> Optional[float]:
+        return self.quantile(0.5)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "k": self.k,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "levels": [items.tolist() for items in self.levels]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(k=data["k"])
+        sketch.count = data["count"]
+        sketch.min = data["min"] if data["min"] is not None else np.inf
+        sketch.max = data["max"] if data["max"] is not None else -np.inf
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data["levels"]] or [np.empty(0)]
+        return sketch
+
+
+class FrequentItemsSketch:
+    """Mergeable Misra-Gries summary of the most frequent values
+    
+    Counts are exact while at most `capacity` distinct values have been seen;
+    beyond that every count is underestimated by at most `error` (n / capacity).
+    """
+    
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+        self.count = 0
+        self.error = 0
+    
+    def update(self, values) -> "FrequentItemsSketch":
+        batch = pd.Series(values).value_counts(dropna=True)
+        # Categorical value_counts also lists categories that do not occur
+        batch = batch[batch > 0]
+        return self._merge_counts(dict(zip(batch.index.tolist(), batch.to_numpy().tolist())), int(batch.sum()), 0)
+    
+    def merge(self, other: "FrequentItemsSketch") -> "FrequentItemsSketch":
+        return self._merge_counts(other.counts, other.count, other.error)
+    
+    def _merge_counts(self, counts: Dict[Any, int], count: int, error: int) -> "FrequentItemsSketch":
+        merged = dict(self.counts)
+        for value, n in counts.items():
+            merged[value] = merged.get(value, 0) + int(n)
+        self.count += count
+        self.error += error
+        if len(merged) > self.capacity:
+            # Subtract the (capacity+1)-th largest count; only heavier values survive
+            cut = sorted(merged.values(), reverse=True)[self.capacity]
+            merged = {value: n - cut for value, n in merged.items() if n > cut}
+            self.error += cut
+        self.counts = merged
+        return self
+    
+    def top(self, n: int = 10) -> List[Dict[str, Any]]:
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [{"value": value, "count": count} for value, count in items]
+    
+    def mode(self) -> Any:
+        if not self.counts:
+            return None
+        best = max(self.counts.values())
+        candidates = [value for value, n in self.counts.items() if n == best]
+        try:
+            return min(candidates)
+        except TypeError:
+            return candidates[0]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "count": self.count,
+            "error": self.error,
+            "counts": [[value, n] for value, n in self.counts.items()]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FrequentItemsSketch":
+        sketch = cls(capacity=data["capacity"])
+        sketch.count = data["count"]
+        sketch.error = data["error"]
+        sketch.counts = {value: n for value, n in data["counts"]}
+        return sketch
+
+
+class HyperLogLog:
+    """Mergeable HyperLogLog distinct-value counter
+    
+    2**p one-byte registers keep the largest leading-zero run seen among the
+    hashes routed to them; the estimate has a relative standard error of
+    1.04 / sqrt(2**p) (1.6% at the default p=12) in 4KB of state.
+    """
+    
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+    
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / np.sqrt(self.m)
+    
+    # Integer columns spanning at most this many values are deduplicated with a bincount before hashing
+    DENSE_INT_RANGE = 1 << 20
+    
+    @classmethod
+    def _hashes(cls, values) -> np.ndarray:
+        series = pd.Series(values)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Hash each category once and keep the ones that occur
+            codes = series.cat.codes.to_numpy()
+            occurring = np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(series.cat.categories)))
+            return pd.util.hash_array(series.cat.categories.to_numpy()[occurring])
+        values = series.dropna().to_numpy()
+        if values.dtype.kind in "iu" and len(values):
+            low, high = int(values.min()), int(values.max())
+            if high - low < cls.DENSE_INT_RANGE:
+                occurring = np.flatnonzero(np.bincount((values - low).astype(np.int64)))
+                return pd.util.hash_array((occurring + low).astype(np.int64))
+            values = values.astype(np.int64)
+        return pd.util.hash_array(values)
+    
+    def update(self, values) -> "HyperLogLog":
+        hashes = self._hashes(values)
+        if len(hashes) == 0:
+            return self
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        # A sentinel bit caps the rank at 64 - p + 1; frexp's exponent is the bit length
+        rest = (hashes << np.uint64(self.p)) | np.uint64(1 << (self.p - 1))
+        rank = 65 - np.frexp(rest.astype(np.float64))[1]
+        # Max rank per register without a scatter-max: mark (register, rank) pairs, take the last mark
+        seen = np.zeros((self.m, 66 - self.p), dtype=bool)
+        seen[index, rank] = True
+        ranks = seen.shape[1] - 1 - np.argmax(seen[:, ::-1], axis=1)
+        ranks[~seen.any(axis=1)] = 0
+        np.maximum(self.registers, ranks.astype(np.uint8), out=self.registers)
+        return self
+    
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge HyperLogLog sketches with p={self.p} and p={other.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+    
+    def estimate(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros > 0:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = self.m * np.log(self.m / zeros)
+        return float(estimate)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "registers": self.registers.tolist()}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        sketch = cls(p=data["p"])
+        sketch.registers = np.asarray(data["registers"], dtype=np.uint8)
+        return sketch
+
+
+class DuplicateDetector:
+    """Finds duplicate rows from 64-bit row hashes with bounded memory
+    
+    Hashes are spilled to disk in partitions by their top bits; each partition
+    is then sorted on its own, so peak memory is one partition plus a boolean
+    mask over the rows rather than every hash at once.
+    """
+    
+    def __init__(self, spill_dir: Path, partitions: int = 64):
+        self.spill_dir = Path(spill_dir)
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.partitions = partitions
+        self._shift = np.uint64(64 - int(np.log2(partitions)))
+        self.rows = 0
+    
+    def _path(self, partition: int) -> Path:
+        return self.spill_dir / f"hashes-{partition:03d}.bin"
+    
+    def add(self, df: pd.DataFrame):
+        floats = df.select_dtypes(include=["floating"]).columns
+        if len(floats):
+            # -0.0 and 0.0 compare equal in DataFrame.duplicated() but hash differently
+            df = df.assign(**{col: df[col] + 0.0 for col in floats})
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+        positions = np.arange(self.rows, self.rows + len(hashes), dtype=np.uint64)
+        partition_ids = hashes >> self._shift
+        for partition in np.unique(partition_ids):
+            selected = partition_ids == partition
+            pairs = np.column_stack([hashes[selected], positions[selected]])
+            with open(self._path(int(partition)), "ab") as f:
+                pairs.tofile(f)
+        self.rows += len(hashes)
+    
+    def duplicate_mask(self) -> np.ndarray:
+        """True for every row whose content appeared in an earlier row"""
+        mask = np.zeros(self.rows, dtype=bool)
+        for partition in range(self.partitions):
+            path = self._path(partition)
+            if not path.exists():
+                continue
+            pairs = np.fromfile(path, dtype=np.uint64).reshape(-1, 2)
+            # Sort by hash, then position, so the first occurrence comes first
+            order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+            hashes, positions = pairs[order, 0], pairs[order, 1]
+            repeated = np.zeros(len(hashes), dtype=bool)
+            repeated[1:] = hashes[1:] == hashes[:-1]
+            mask[positions[repeated].astype(np.int64)] = True
+        return mask
@@ -0,0 +1,309 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from app.config import settings
+from app.ml.trainer import model_trainer, TrainingProgress, TRAINER_VERSION
+from app.services.data_service import data_service
+from app.services.job_store import JobStore, FINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+TRAINING_JOB = "training"
+ISOLATION_MODES = ("process", "thread")
+DISPATCH_MODES = ("local", "queue")
+# TrainRequest fields that do not change what a training produces (the dataset is identified by content)
+NON_RESULT_PARAMS = ("filename",)
+
+
+class JobProgress(TrainingProgress):
+    """Records a running job's stages and events in the job table and polls it for cancellation
+    
+    The ETA extrapolates the time spent so far over the remaining progress.
+    """
+    
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.started = time.monotonic()
+    
+    def update(self, stage: str, progress: float, message: Optional[str] = None):
+        elapsed = time.monotonic() - self.started
+        eta_seconds = round(elapsed * (1 - progress) / progress, 1) if progress > 0 else None
+        self.store.report(self.job_id, stage, progress, message, eta_seconds)
+        self.store.add_event(self.job_id, "stage", {
+            "stage": stage,
+            "progress": progress,
+            "message": message,
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta_seconds
+        })
+    
+    def event(self, event_type: str, **data):
+        self.store.add_event(self.job_id, event_type, data)
+    
+    def timing(self, estimator: str, seconds: float, **fields):
+        self.store.record_timing(self.job_id, estimator, seconds, **fields)
+    
+    def past_timings(self, estimator: str) -> List[Dict[str, Any]]:
+        return self.store.timings(estimator, limit=20)
+    
+    def cancelled(self) -> bool:
+        return self.store.cancel_requested(self.job_id)
+
+
+def new_training_executor(max_workers: int, isolation: str) -> Executor:
+    """Pool that training jobs run on: spawned single-use processes, or threads of this process"""
+    if isolation not in ISOLATION_MODES:
+        raise ValueError(f"Unknown TRAINING_ISOLATION '{isolation}'. Available: {list(ISOLATION_MODES)}")
+    if isolation == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="training")
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        # Spawned, not forked: the API process has threads and open memory maps
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=1
+    )
+
+
+class TrainingPool:
+    """Training executor that fails the jobs of dead workers and replaces the pool a dead worker process breaks"""
+    
+    def __init__(self, store: JobStore, max_workers: int, isolation: str, on_replaced: Optional[Callable[[], None]] = None):
+        self.store = store
+        self.max_workers = max_workers
+        self.isolation = isolation
+        self.on_replaced = on_replaced
+        self._lock = threading.RLock()
+        self._executor = new_training_executor(max_workers, isolation)
+        self._jobs = set()
+        self._terminated = False
+    
+    def submit(self, fn: Callable[[JobStore, str], None], job_id: str, on_done: Optional[Callable[[Future], None]] = None) -> Future:
+        """Run fn(store, job_id) on the pool; on_done(future) is called once the job is over"""
+        with self._lock:
+            executor = self._executor
+            future = executor.submit(fn, self.store, job_id)
+            self._jobs.add(job_id)
+        future.add_done_callback(lambda f: self._on_done(job_id, executor, f, on_done))
+        return future
+    
+    def _on_done(self, job_id: str, executor: Executor, future: Future, on_done: Optional[Callable[[Future], None]]):
+        with self._lock:
+            self._jobs.discard(job_id)
+        if not future.cancelled() and future.exception() is not None:
+            error = future.exception()
+            # Fails the job only if its worker died before recording the outcome (no-op unless still running)
+            self.store.finish(job_id, "failed", error=f"Training worker died: {error!r}")
+            if isinstance(error, BrokenProcessPool):
+                with self._lock:
+                    if self._executor is executor and not self._terminated:
+                        self._executor = new_training_executor(self.max_workers, self.isolation)
+                        if self.on_replaced:
+                            self.on_replaced()
+        if on_done:
+            on_done(future)
+    
+    def heartbeat(self):
+        """Record that the pool's running jobs are alive (jobs still waiting in the pool are not running yet)"""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.store.heartbeat(job_id)
+    
+    def fail_stale(self) -> int:
+        """Fail the running jobs of dead pools and workers anywhere, i.e. jobs whose heartbeat stopped"""
+        stale = self.store.fail_stale("Training worker stopped sending heartbeats", settings.WORKER_HEARTBEAT_TIMEOUT)
+        if stale:
+            logger.warning(f"Marked {stale} training job(s) of unresponsive workers as failed")
+        return stale
+    
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+    
+    def terminate(self):
+        """Drop the waiting jobs and kill the processes running the others (threads cannot be stopped)"""
+        with self._lock:
+            self._terminated = True
+            executor = self._executor
+        # Private, but the only handle on the children; shutdown() clears it, so it is read first
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_training_job(store: JobStore, job_id: str):
+    """Claim and run one queued training job, recording its outcome in the job table
+    
+    Module-level so that it can be sent to a worker process.
+    """
+    if not store.claim(job_id, worker_name()):
+        return  # Cancelled while queued
+    execute_training_job(store, job_id)
+
+
+def execute_training_job(store: JobStore, job_id: str):
+    """Run a training job that is already claimed (status running)"""
+    params = store.get(job_id)["params"]
+    progress = JobProgress(store, job_id)
+    try:
+        progress.update("load", 0.0, "Loading the dataset")
+        name = data_service.resolve_dataset(params["filename"], prefer_preprocessed=True)
+        df = data_service.load_dataset_sync(name)
+        dataset = data_service.store.dataset_name(params["filename"])
+        if params.get("incremental") or params.get("base_model_id"):
+            base_model_id = params.get("base_model_id") or model_trainer.latest_model(dataset, params["target"])
+            if base_model_id is None:
+                raise ValueError(f"No model of '{params['target']}' on '{dataset}' to retrain incrementally")
+            result = model_trainer.retrain_sync(
+                df=df,
+                base_model_id=base_model_id,
+                target=params["target"],
+                dataset=dataset,
+                imputer=data_service.load_imputer(params["filename"]),
+                dataset_version=data_service.content_version(name),
+                lineage=data_service.append_lineage(name),
+                progress=progress
+            )
+        else:
+            result = model_trainer.train_sync(
+                df=df,
+                target=params["target"],
+                problem_type=params["problem_type"],
+                model_name=params.get("model_name"),
+                features=params.get("features"),
+                dataset=dataset,
+                imputer=data_service.load_imputer(params["filename"]),
+                time_budget=params.get("max_training_time"),
+                successive_halving=params.get("successive_halving"),
+                dataset_version=data_service.content_version(name),
+                progress=progress
+            )
+    except Exception as e:
+        logger.exception(f"Training job {job_id} failed")
+        result = {"status": "failed", "error": str(e)}
+    
+    status = result.get("status")
+    if status not in FINAL_STATUSES:
+        status = "failed"
+    store.finish(
+        job_id,
+        status,
+        result=result if status == "completed" else None,
+        error=result.get("error")
+    )
+
+
+class TrainingJobService:
+    """Runs training requests as background jobs, on a bounded pool or by queue workers (TRAINING_DISPATCH)"""
+    
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        max_workers: Optional[int] = None,
+        isolation: Optional[str] = None,
+        dispatch: Optional[str] = None
+    ):
+        self.store = store or JobStore()
+        self.max_workers = max_workers or settings.TRAINING_WORKERS
+        self.isolation = isolation or settings.TRAINING_ISOLATION
+        self.dispatch = dispatch or settings.TRAINING_DISPATCH
+        if self.dispatch not in DISPATCH_MODES:
+            raise ValueError(f"Unknown TRAINING_DISPATCH '{self.dispatch}'. Available: {list(DISPATCH_MODES)}")
+        self._pool = TrainingPool(
+            self.store, self.max_workers, self.isolation, on_replaced=self._requeue
+        ) if self.dispatch == "local" else None
+        self._stopped = threading.Event()
+    
+    def _enqueue(self, job_id: str):
+        self._pool.submit(run_training_job, job_id)
+    
+    def _requeue(self):
+        # A dead worker breaks the whole pool; queued jobs are resubmitted to the fresh one
+        for job in self.store.list(status="queued", limit=-1):
+            self._enqueue(job["id"])
+    
+    def request_key(self, params: Dict[str, Any]) -> str:
+        """Identity of a training: the content of the dataset it reads plus every parameter that affects its model"""
+        name = data_service.resolve_dataset(params["filename"], prefer_preprocessed=True)
+        identity = {
+            "dataset": name,
+            "dataset_version": data_service.content_version(name),
+            "trainer": TRAINER_VERSION,
+            **{field: value for field, value in params.items() if field not in NON_RESULT_PARAMS}
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+    
+    @staticmethod
+    def _model_exists(job: Dict[str, Any]) -> bool:
+        model_id = (job["result"] or {}).get("model_id")
+        return bool(model_id) and (Path(settings.MODEL_STORAGE_PATH) / f"{model_id}.pkl").exists()
+    
+    def submit(self, params: Dict[str, Any], force: bool = False) -> Dict[str, Any]:
+        """Queue a training of params (the fields of a TrainRequest)
+        
+        An identical request (same dataset content and parameters, same trainer
+        version) returns the job that already produced or is producing its model,
+        unless force is set. Reused jobs are marked with "reused": True.
+        """
+        request_key = self.request_key(params)
+        if force:
+            job, reused = self.store.create(TRAINING_JOB, params, request_key), False
+        else:
+            job, reused = self.store.create_or_reuse(TRAINING_JOB, params, request_key, self._model_exists)
+        if not reused and self._pool is not None:
+            self._enqueue(job["id"])
+        return {**job, "reused": reused}
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+    
+    def events(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        return self.store.events(job_id, after_seq)
+    
+    def timings(self, estimator: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        return self.store.timings(estimator, limit)
+    
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return self.store.list(status, limit)
+    
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or ask a running one to stop at its next stage boundary"""
+        return self.store.request_cancel(job_id)
+    
+    def recover(self):
+        """Requeue the jobs that never started and start sending heartbeats for the pool's jobs"""
+        if self._pool is None:
+            return  # Queue workers pick up queued jobs and fail the orphaned ones themselves
+        for job in self.store.list(status="queued", limit=-1):
+            self._enqueue(job["id"])
+        threading.Thread(target=self._monitor, name="training-heartbeat", daemon=True).start()
+    
+    def _monitor(self):
+        # Jobs of a restarted or dead replica (this one included) fail once their heartbeat goes stale,
+        # so a replica never fails the jobs that other replicas sharing the table are still running
+        while True:
+            self._pool.heartbeat()
+            self._pool.fail_stale()
+            if self._stopped.wait(settings.WORKER_POLL_INTERVAL):
+                return
+    
+    def shutdown(self):
+        self._stopped.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+training_job_service = TrainingJobService()
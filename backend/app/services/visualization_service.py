@@ -246,6 +246,57 @@ class VisualizationService:
         except Exception as e:
             return {"error": f"Failed to generate correlation heatmap: {str(e)}"}
     
+    def generate_column_distributions(
+        self,
+        profile: Dict[str, Any],
+        columns: Optional[List[str]] = None,
+        max_columns: int = 12
+    ) -> Dict[str, Any]:
+        """Per-column distribution charts from a stored column profile, without reading the rows
+        
+        Numeric columns are drawn from their histogram, the others from their top values.
+        """
+        try:
+            column_profiles = {column["name"]: column for column in profile["columns"]}
+            names = columns if columns is not None else list(column_profiles)[:max_columns]
+            missing = [name for name in names if name not in column_profiles]
+            if missing:
+                return {"error": f"Columns not found in profile: {missing}"}
+            
+            charts = {}
+            for name in names:
+                column = column_profiles[name]
+                if column.get("histogram"):
+                    edges = np.array(column["histogram"]["edges"])
+                    fig = go.Figure(data=[go.Bar(
+                        x=(edges[:-1] + edges[1:]) / 2,
+                        y=column["histogram"]["counts"],
+                        width=np.diff(edges) if len(edges) > 2 else None,
+                        marker=dict(color='#3b82f6')
+                    )])
+                    xaxis_title = name
+                elif column.get("top_values"):
+                    top_values = column["top_values"]
+                    fig = go.Figure(data=[go.Bar(
+                        x=[str(item["value"]) for item in top_values],
+                        y=[item["count"] for item in top_values],
+                        marker=dict(color='#10b981')
+                    )])
+                    xaxis_title = f"{name} (top values)"
+                else:
+                    continue
+                fig.update_layout(
+                    title=f'Distribution of {name}',
+                    xaxis_title=xaxis_title,
+                    yaxis_title='Count',
+                    template='plotly_white',
+                    height=350
+                )
+                charts[name] = json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder))
+            return charts
+        except Exception as e:
+            return {"error": f"Failed to generate column distributions: {str(e)}"}
+    
     def generate_classification_metrics(self, y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, Any]:
         """Generate classification metrics bar chart"""
         try:
@@ -0,0 +1,117 @@
+from concurrent.futures import Future
+from typing import Dict, Optional
+import argparse
+import logging
+import os
+import signal
+import threading
+from app.config import settings
+from app.services.job_store import JobStore
+from app.services.training_job_service import (
+    TRAINING_JOB, TrainingPool, execute_training_job, worker_name
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingWorker:
+    """Claims queued training jobs from the shared job table and runs them, up to `concurrency` at a time"""
+    
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        concurrency: Optional[int] = None,
+        isolation: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        name: Optional[str] = None
+    ):
+        self.store = store or JobStore()
+        self.concurrency = concurrency or settings.TRAINING_WORKERS
+        self.isolation = isolation or settings.TRAINING_ISOLATION
+        self.poll_interval = poll_interval or settings.WORKER_POLL_INTERVAL
+        self.name = name or worker_name()
+        self.running: Dict[str, Future] = {}
+        self.draining = False
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._pool = TrainingPool(self.store, self.concurrency, self.isolation)
+    
+    def run(self, max_jobs: Optional[int] = None):
+        """Claim and run jobs until stop() is called (or max_jobs have been started) and the running ones finish"""
+        logger.info(f"Training worker {self.name} started ({self.concurrency} slots, {self.isolation} isolation)")
+        started = 0
+        while True:
+            if max_jobs is not None and started >= max_jobs:
+                self.draining = True
+            if self.draining and not self.running:
+                break
+            self._pool.heartbeat()
+            self._pool.fail_stale()
+            while not self.draining and len(self.running) < self.concurrency:
+                job = self.store.claim_next(self.name, TRAINING_JOB)
+                if job is None:
+                    break
+                self._start(job["id"])
+                started += 1
+                if max_jobs is not None and started >= max_jobs:
+                    break
+            # Woken early when a job finishes and frees a slot
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+        self._pool.shutdown(wait=True)
+        logger.info(f"Training worker {self.name} stopped after {started} job(s)")
+    
+    def stop(self):
+        """Stop claiming jobs; run() returns once the running ones finish"""
+        self.draining = True
+        self._wakeup.set()
+    
+    def _start(self, job_id: str):
+        logger.info(f"Running training job {job_id}")
+        with self._lock:
+            future = self._pool.submit(execute_training_job, job_id, on_done=lambda f: self._on_done(job_id))
+            # A job that is already over has been through _on_done
+            if not future.done():
+                self.running[job_id] = future
+    
+    def terminate(self):
+        """Kill the running jobs now and mark them failed"""
+        self.draining = True
+        self._pool.terminate()
+        with self._lock:
+            job_ids = list(self.running)
+        for job_id in job_ids:
+            self.store.finish(job_id, "failed", error=f"Training worker {self.name} was stopped")
+    
+    def _on_done(self, job_id: str):
+        with self._lock:
+            self.running.pop(job_id, None)
+        self._wakeup.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued training jobs from the shared job table")
+    parser.add_argument("--concurrency", type=int, default=None, help="Trainings run at once (default TRAINING_WORKERS)")
+    parser.add_argument("--max-jobs", type=int, default=None, help="Exit after running this many jobs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    
+    worker = TrainingWorker(concurrency=args.concurrency)
+    
+    def handle_signal(signum, frame):
+        if worker.draining:
+            logger.warning(f"Stopping now, failing {len(worker.running)} running job(s)")
+            worker.terminate()
+            logging.shutdown()
+            # Not SystemExit: interpreter exit would join the pool and wait for the trainings after all
+            os._exit(1)
+        logger.info("Finishing the running jobs before stopping; signal again to stop now")
+        worker.stop()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    worker.run(max_jobs=args.max_jobs)
+
+
+if __name__ == "__main__":
+    main()
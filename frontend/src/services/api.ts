@@ -2,6 +2,8 @@ import axios from 'axios';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'https://rasan-ai-labs-production.up.railway.app/api/v1';
 
+const TRAINING_POLL_INTERVAL_MS = 2000;
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
@@ -38,7 +40,26 @@ export const trainModel = async (data: {
   model_name?: string;
   features?: string[];
 }) => {
-  const response = await api.post('/train', data);
+  // Training runs as a background job; poll it until it finishes
+  const { data: job } = await api.post('/train', data);
+  for (;;) {
+    const { data: status } = await api.get(`/train/jobs/${job.id}`);
+    if (['completed', 'failed', 'cancelled'].includes(status.status)) {
+      break;
+    }
+    await new Promise((resolve) => setTimeout(resolve, TRAINING_POLL_INTERVAL_MS));
+  }
+  const response = await api.get(`/train/jobs/${job.id}/result`);
+  return response.data;
+};
+
+export const getTrainingJob = async (jobId: string) => {
+  const response = await api.get(`/train/jobs/${jobId}`);
+  return response.data;
+};
+
+export const cancelTrainingJob = async (jobId: string) => {
+  const response = await api.post(`/train/jobs/${jobId}/cancel`);
   return response.data;
 };
 